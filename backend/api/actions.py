@@ -0,0 +1,106 @@
+"""Избранное, список покупок и подписки.
+
+Общая часть для view DRF и асинхронных view: функции возвращают данные
+ответа и код статуса, ошибки — исключения DRF.
+"""
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from rest_framework import status
+
+from recipes.counters import refresh_counters
+from recipes.models import Favorite, Recipe
+from recipes.versions import invalidate_recipes
+from users.models import Subscribe
+from .serializers import RecipeSerializer, SubscribeSerializer
+
+User = get_user_model()
+
+
+@transaction.atomic
+def add_recipe(model, user, pk):
+    if model.objects.filter(user=user, recipe__id=pk).exists():
+        return {'errors': 'Рецепт уже добавлен!'}, status.HTTP_400_BAD_REQUEST
+    recipe = get_object_or_404(Recipe, id=pk)
+    model.objects.create(user=user, recipe=recipe)
+    return RecipeSerializer(recipe).data, status.HTTP_201_CREATED
+
+
+@transaction.atomic
+def delete_recipe(model, user, pk):
+    recipe_del = model.objects.filter(user=user, recipe__id=pk)
+    if recipe_del.exists():
+        recipe_del.delete()
+        return None, status.HTTP_204_NO_CONTENT
+    return {'errors': 'Рецепт уже удален!'}, status.HTTP_400_BAD_REQUEST
+
+
+def recipes_state(model, user, ids):
+    """id существующих рецептов -> есть ли рецепт у пользователя,
+    одним запросом."""
+    return dict(Recipe.objects.filter(id__in=ids).annotate(
+        present=Exists(model.objects.filter(user=user,
+                                            recipe=OuterRef('pk'))),
+    ).order_by().values_list('id', 'present'))
+
+
+def batch_changed(model, recipe_ids):
+    """Пакетные вставка и удаление не вызывают сигналов: счетчики и кэш
+    ответов обновляются здесь, один раз на пакет."""
+    fields = {'updated_at': timezone.now()} if model is Favorite else {}
+    refresh_counters(model, recipe_ids, **fields)
+    if model is Favorite:
+        transaction.on_commit(
+            lambda: invalidate_recipes(recipe_ids, lists=False))
+
+
+@transaction.atomic
+def add_recipes(model, user, ids):
+    """Пакетное добавление; статус для каждого id: added, exists или
+    not_found."""
+    ids = list(dict.fromkeys(ids))
+    state = recipes_state(model, user, ids)
+    added = [pk for pk in ids if pk in state and not state[pk]]
+    model.objects.bulk_create(
+        [model(user=user, recipe_id=pk) for pk in added],
+        ignore_conflicts=True)
+    batch_changed(model, added)
+    results = [{'id': pk, 'status': 'not_found' if pk not in state
+                else 'exists' if state[pk] else 'added'} for pk in ids]
+    return {'results': results}, status.HTTP_200_OK
+
+
+@transaction.atomic
+def delete_recipes(model, user, ids):
+    """Пакетное удаление одним DELETE; статус для каждого id: removed,
+    missing или not_found."""
+    ids = list(dict.fromkeys(ids))
+    state = recipes_state(model, user, ids)
+    removed = [pk for pk in ids if state.get(pk)]
+    if removed:
+        queryset = model.objects.filter(user=user, recipe_id__in=removed)
+        queryset._raw_delete(queryset.db)
+    batch_changed(model, removed)
+    results = [{'id': pk, 'status': 'not_found' if pk not in state
+                else 'removed' if state[pk] else 'missing'} for pk in ids]
+    return {'results': results}, status.HTTP_200_OK
+
+
+@transaction.atomic
+def subscribe(request, author_id, data):
+    author = get_object_or_404(User, id=author_id)
+    serializer = SubscribeSerializer(author, data=data,
+                                     context={'request': request})
+    serializer.is_valid(raise_exception=True)
+    Subscribe.objects.create(user=request.user, author=author)
+    return serializer.data, status.HTTP_201_CREATED
+
+
+@transaction.atomic
+def unsubscribe(user, author_id):
+    author = get_object_or_404(User, id=author_id)
+    subscription = get_object_or_404(Subscribe, user=user, author=author)
+    subscription.delete()
+    return None, status.HTTP_204_NO_CONTENT
@@ -0,0 +1,53 @@
+from django.contrib import admin
+from django.core.exceptions import PermissionDenied
+from django.http import FileResponse
+from django.shortcuts import get_object_or_404
+from django.urls import path, reverse
+from django.utils.html import format_html
+
+from api.models import RequestProfile
+from api.profiling import profile_path, stats_text
+
+
+@admin.register(RequestProfile)
+class RequestProfileAdmin(admin.ModelAdmin):
+    list_display = ('created', 'method', 'path', 'view', 'status',
+                    'duration', 'sampled', 'user', 'download')
+    list_filter = ('view', 'method', 'sampled')
+    search_fields = ('path',)
+    fields = ('created', 'method', 'path', 'view', 'status', 'duration',
+              'sampled', 'user', 'download', 'stats')
+    readonly_fields = fields
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def get_urls(self):
+        return [
+            path('<int:pk>/download/',
+                 self.admin_site.admin_view(self.download_view),
+                 name='api_requestprofile_download'),
+        ] + super().get_urls()
+
+    def download_view(self, request, pk):
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        profile = get_object_or_404(RequestProfile, pk=pk)
+        return FileResponse(open(profile_path(profile), 'rb'),
+                            as_attachment=True, filename=profile.file)
+
+    @admin.display(description='Файл')
+    def download(self, obj):
+        return format_html(
+            '<a href="{}">{}</a>',
+            reverse('admin:api_requestprofile_download', args=[obj.pk]),
+            obj.file)
+
+    @admin.display(description='Статистика')
+    def stats(self, obj):
+        if not profile_path(obj).exists():
+            return 'Файл профиля удален'
+        return format_html('<pre>{}</pre>', stats_text(obj))
@@ -0,0 +1,13 @@
+from django.urls import path
+
+from . import async_views
+
+urlpatterns = [
+    path('tags/', async_views.tag_list),
+    path('tags/<int:pk>/', async_views.tag_detail),
+    path('ingredients/', async_views.ingredient_list),
+    path('ingredients/<int:pk>/', async_views.ingredient_detail),
+    path('recipes/<int:pk>/favorite/', async_views.favorite),
+    path('recipes/<int:pk>/shopping_cart/', async_views.shopping_cart),
+    path('users/<int:pk>/subscribe/', async_views.subscribe),
+]
@@ -0,0 +1,173 @@
+"""Асинхронные варианты частых легких эндпоинтов для режима ASGI.
+
+Django 3.2 выполняет синхронный код из асинхронных view в одном общем
+потоке процесса, поэтому работа с базой здесь уходит в пул потоков
+(db_call) и закрывает соединение по тем же правилам, что и конец
+запроса WSGI. Справочники и проверка токена (CachedTokenAuthentication
+DRF) тоже вызываются через db_call: при промахе кэша они обращаются к
+базе. Ошибки превращаются в ответы обработчиком исключений DRF, поэтому
+ответы совпадают с ответами view DRF в формате JSON.
+"""
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.db import close_old_connections
+from django.http import Http404, HttpResponse
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags, quote_etag
+from rest_framework import exceptions, status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.settings import api_settings
+
+from recipes.models import Favorite, ShoppingList
+from recipes.versions import INGREDIENTS, TAGS
+from . import actions
+from .authentication import CachedTokenAuthentication
+from .catalog import ingredient_index, tag_map
+from .conditional import catalog_etag
+
+renderer = JSONRenderer()
+authentication = CachedTokenAuthentication()
+
+
+def db_call(func):
+    """func в пуле потоков; соединение с базой закрывается, как после
+    запроса, если оно устарело или CONN_MAX_AGE = 0. SQL-запросы
+    попадают в метрики текущего запроса (api.metrics.record_query)."""
+    @wraps(func)
+    def run(*args, **kwargs):
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+    return sync_to_async(run, thread_sensitive=False)
+
+
+def render(data, code=status.HTTP_200_OK, headers=None):
+    response = HttpResponse(
+        b'' if data is None else renderer.render(data),
+        status=code, content_type='application/json')
+    for name, value in (headers or {}).items():
+        response[name] = value
+    return response
+
+
+def render_error(request, exc):
+    """Ответ обработчика исключений DRF, как в APIView.handle_exception."""
+    if isinstance(exc, (exceptions.NotAuthenticated,
+                        exceptions.AuthenticationFailed)):
+        exc.auth_header = authentication.authenticate_header(request)
+    response = api_settings.EXCEPTION_HANDLER(
+        exc, {'request': request, 'view': None})
+    if response is None:
+        raise exc
+    response.accepted_renderer = renderer
+    response.accepted_media_type = renderer.media_type
+    response.renderer_context = {'request': request}
+    return response.render()
+
+
+def api_view(*methods):
+    """Асинхронный view с допустимыми методами; исключения DRF, Http404
+    и PermissionDenied превращаются в ответы обработчиком DRF."""
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            request.accepted_renderer = renderer
+            try:
+                if request.method not in methods:
+                    raise exceptions.MethodNotAllowed(request.method)
+                return await view(request, *args, **kwargs)
+            except (exceptions.APIException, Http404,
+                    PermissionDenied) as exc:
+                return render_error(request, exc)
+        wrapper.csrf_exempt = True
+        return wrapper
+    return decorator
+
+
+def authenticated(request):
+    """Пользователь и токен по заголовку Authorization средствами DRF;
+    без заголовка — NotAuthenticated."""
+    credentials = authentication.authenticate(request)
+    if credentials is None:
+        raise exceptions.NotAuthenticated()
+    return credentials
+
+
+async def authenticate(request):
+    request.user, request.auth = await db_call(authenticated)(request)
+    return request.user
+
+
+async def catalog_response(request, name, method, *args):
+    """Ответ справочника с теми же ETag и Cache-Control, что у DRF."""
+    etag = quote_etag(catalog_etag(name)(request))
+    if etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+        response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+    else:
+        data = await db_call(method)(*args)
+        if data is None:
+            raise exceptions.NotFound()
+        response = render(data)
+    response['ETag'] = etag
+    patch_cache_control(response, public=True,
+                        max_age=settings.CATALOG_CACHE_MAX_AGE)
+    return response
+
+
+@api_view('GET', 'HEAD')
+async def tag_list(request):
+    return await catalog_response(request, TAGS, tag_map.all)
+
+
+@api_view('GET', 'HEAD')
+async def tag_detail(request, pk):
+    return await catalog_response(request, TAGS, tag_map.get, pk)
+
+
+@api_view('GET', 'HEAD')
+async def ingredient_list(request):
+    return await catalog_response(
+        request, INGREDIENTS, ingredient_index.search,
+        request.GET.get('name', ''), settings.INGREDIENTS_SEARCH_LIMIT)
+
+
+@api_view('GET', 'HEAD')
+async def ingredient_detail(request, pk):
+    return await catalog_response(request, INGREDIENTS,
+                                  ingredient_index.get, pk)
+
+
+async def toggle_recipe(request, model, pk):
+    user = await authenticate(request)
+    if request.method == 'POST':
+        data, code = await db_call(actions.add_recipe)(model, user, pk)
+    else:
+        data, code = await db_call(actions.delete_recipe)(model, user, pk)
+    return render(data, code)
+
+
+@api_view('POST', 'DELETE')
+async def favorite(request, pk):
+    """Добавление и удаление из избранного."""
+    return await toggle_recipe(request, Favorite, pk)
+
+
+@api_view('POST', 'DELETE')
+async def shopping_cart(request, pk):
+    """Добавление и удаление из списка покупок."""
+    return await toggle_recipe(request, ShoppingList, pk)
+
+
+@api_view('POST', 'DELETE')
+async def subscribe(request, pk):
+    """Подписка на автора и отписка."""
+    user = await authenticate(request)
+    if request.method == 'POST':
+        data, code = await db_call(actions.subscribe)(request, pk, {})
+    else:
+        data, code = await db_call(actions.unsubscribe)(user, pk)
+    return render(data, code)
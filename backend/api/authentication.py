@@ -0,0 +1,88 @@
+"""Аутентификация по токену с кэшем токен -> пользователь.
+
+Разрешенные токены хранятся в LRU процесса не дольше
+TOKEN_CACHE_TIMEOUT секунд. Запись действительна, пока не изменилась
+версия пользователя в кэше Django: ее сбрасывают выход, удаление
+токена и сохранение пользователя (смена пароля, роли, активности).
+Версии видны всем процессам только в общем кэше по умолчанию; с
+локальным кэшем (см. app.caches) приложение работает в одном процессе,
+и его версии так же точны.
+"""
+import copy
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.authentication import TokenAuthentication
+
+
+def auth_version(user_id):
+    return cache.get_or_set(f'auth_version:{user_id}', uuid.uuid4().hex,
+                            timeout=None)
+
+
+def bump_auth_version(user_id):
+    cache.set(f'auth_version:{user_id}', uuid.uuid4().hex, timeout=None)
+
+
+class TokenCache:
+    """Ограниченный LRU с временем жизни записей."""
+
+    def __init__(self, size, timeout):
+        self.size = size
+        self.timeout = timeout
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1:]
+
+    def set(self, key, user, token, version):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.timeout,
+                                  user, token, version)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def discard(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+token_cache = TokenCache(settings.TOKEN_CACHE_SIZE,
+                         settings.TOKEN_CACHE_TIMEOUT)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication без запроса Token join User на каждый запрос.
+
+    Каждый запрос получает свою копию пользователя, чтобы изменения
+    объекта во view не попадали в кэш.
+    """
+
+    def authenticate_credentials(self, key):
+        entry = token_cache.get(key)
+        if entry is not None:
+            user, token, version = entry
+            if version == auth_version(user.pk):
+                return copy.copy(user), token
+            token_cache.discard(key)
+        user, token = super().authenticate_credentials(key)
+        token_cache.set(key, user, token, auth_version(user.pk))
+        return copy.copy(user), token
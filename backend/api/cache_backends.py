@@ -0,0 +1,59 @@
+"""Бэкенды кэша ответов с подсчетом вытеснений.
+
+LocMemCache и FileBasedCache — стандартные бэкенды Django, которые
+считают записи, удаленные при переполнении, RedisCache — бэкенд
+django-redis, который берет число вытеснений у сервера.
+"""
+import random
+from collections import defaultdict
+
+from django.core.cache.backends import filebased, locmem
+from django_redis import cache as redis_cache
+
+EVICTIONS = defaultdict(int)
+
+
+class LocMemCache(locmem.LocMemCache):
+    """Кэш в памяти процесса; вытеснения считаются в этом процессе."""
+
+    def __init__(self, name, params):
+        super().__init__(name, params)
+        self._name = name
+
+    def _cull(self):
+        size = len(self._cache)
+        super()._cull()
+        EVICTIONS[self._name] += size - len(self._cache)
+
+    def evictions(self):
+        return EVICTIONS[self._name]
+
+
+class FileBasedCache(filebased.FileBasedCache):
+    """Кэш в файлах каталога; вытеснения считаются в этом процессе."""
+
+    def _cull(self):
+        filelist = self._list_cache_files()
+        num_entries = len(filelist)
+        if num_entries < self._max_entries:
+            return
+        if self._cull_frequency == 0:
+            EVICTIONS[self._dir] += num_entries
+            return self.clear()
+        filelist = random.sample(filelist,
+                                 int(num_entries / self._cull_frequency))
+        for fname in filelist:
+            self._delete(fname)
+        EVICTIONS[self._dir] += len(filelist)
+
+    def evictions(self):
+        return EVICTIONS[self._dir]
+
+
+class RedisCache(redis_cache.RedisCache):
+    """Кэш на сервере Redis (django-redis); вытеснения считает
+    сервер."""
+
+    def evictions(self):
+        """Вытеснения на сервере по INFO stats (для всех его баз)."""
+        return self.client.get_client().info('stats').get('evicted_keys')
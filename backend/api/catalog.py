@@ -0,0 +1,144 @@
+"""Справочники тегов и ингредиентов в памяти процесса.
+
+Данные перечитываются из базы при смене версии справочника
+(recipes.versions). Версии хранятся в кэше по умолчанию, поэтому
+изменение, сделанное в одном рабочем процессе или команде управления,
+видно всем процессам; в локальном кэше версия живет не дольше
+LOCAL_CACHE_TIMEOUT (см. app.caches), и остальные процессы
+перечитывают справочник с этой задержкой. Справочник всегда читается
+с основной базы: данные с отстающей реплики остались бы в памяти под
+новой версией.
+"""
+import threading
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+
+from recipes.models import Ingredient, Tag
+from recipes.versions import INGREDIENTS, TAGS, catalog_version
+from .db_router import primary
+
+
+class VersionedCatalog(ABC):
+    """Данные справочника в памяти процесса, перечитываемые из базы
+    только при смене версии справочника."""
+    name = None
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+
+    @abstractmethod
+    def load(self):
+        """Читает справочник из базы в память процесса."""
+
+    def is_current(self):
+        """Данные в памяти соответствуют текущей версии справочника."""
+        return catalog_version(self.name) == self._version
+
+    def _refresh(self):
+        version = catalog_version(self.name)
+        if version == self._version:
+            return
+        with self._lock:
+            if version == self._version:
+                return
+            with primary():
+                self.load()
+            self._version = version
+
+
+class IngredientIndex(VersionedCatalog):
+    """Отсортированный индекс ингредиентов в памяти процесса.
+
+    Названия хранятся в casefold, уже сериализованные ингредиенты
+    отдаются без обращения к базе, пока не изменилась версия справочника.
+    """
+    name = INGREDIENTS
+
+    def __init__(self):
+        super().__init__()
+        self._names = []
+        self._items = []
+        self._by_id = {}
+
+    def load(self):
+        from .serializers import IngredientSerializer
+        ingredients = sorted(
+            Ingredient.objects.all(),
+            key=lambda ingredient: (ingredient.name.casefold(),
+                                    ingredient.id))
+        self._items = IngredientSerializer(ingredients, many=True).data
+        self._names = [ingredient.name.casefold()
+                       for ingredient in ingredients]
+        self._by_id = {item['id']: item for item in self._items}
+
+    def all(self):
+        """Все ингредиенты в алфавитном порядке."""
+        self._refresh()
+        return self._items
+
+    def get(self, pk):
+        self._refresh()
+        return self._by_id.get(pk)
+
+    def search(self, query, limit):
+        """Точное совпадение, затем совпадения по началу названия,
+        затем по подстроке; не более limit результатов."""
+        self._refresh()
+        names = self._names
+        query = query.strip().casefold()
+        if not query:
+            return self._items[:limit]
+        position = bisect_left(names, query)
+        found = []
+        while position < len(names) and names[position].startswith(query):
+            found.append(position)
+            position += 1
+        found.sort(key=lambda index: (len(names[index]), index))
+        found = found[:limit]
+        if len(found) < limit:
+            for index, name in enumerate(names):
+                if query in name and not name.startswith(query):
+                    found.append(index)
+                    if len(found) == limit:
+                        break
+        return [self._items[index] for index in found]
+
+
+class TagMap(VersionedCatalog):
+    """Соответствие slug -> id и сериализованные теги."""
+    name = TAGS
+
+    def __init__(self):
+        super().__init__()
+        self._ids = {}
+        self._items = []
+        self._by_id = {}
+
+    def load(self):
+        from .serializers import TagSerializer
+        tags = list(Tag.objects.all())
+        self._ids = {tag.slug: tag.id for tag in tags}
+        self._items = TagSerializer(tags, many=True).data
+        self._by_id = {item['id']: item for item in self._items}
+
+    def ids(self):
+        self._refresh()
+        return self._ids
+
+    def all(self):
+        self._refresh()
+        return self._items
+
+    def get(self, pk):
+        self._refresh()
+        return self._by_id.get(pk)
+
+
+ingredient_index = IngredientIndex()
+tag_map = TagMap()
+
+
+def tag_choices():
+    """Варианты slug тегов для фильтров."""
+    return [(slug, slug) for slug in tag_map.ids()]
@@ -0,0 +1,94 @@
+"""Условные GET-запросы.
+
+ETag и Last-Modified вычисляются до сериализации: неизмененный ресурс
+отдается ответом 304 без загрузки и сериализации данных. ETag
+справочников и рецептов включают версии справочников из кэша по
+умолчанию (recipes.versions): в общем кэше изменение в любом процессе
+сразу меняет ETag во всех, в локальном старый ETag живет не дольше
+LOCAL_CACHE_TIMEOUT.
+"""
+import hashlib
+
+from django.conf import settings
+from django.db.models import Exists, OuterRef
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+from django.views.decorators.vary import vary_on_headers
+
+from recipes.models import Favorite, Recipe, ShoppingList
+from recipes.versions import INGREDIENTS, TAGS, catalog_version
+from users.models import Subscribe
+
+RECIPE_FIELDS = ('updated_at', 'favorites_count', 'author__email',
+                 'author__username', 'author__first_name',
+                 'author__last_name')
+
+
+def make_etag(*parts):
+    return hashlib.md5('|'.join(map(str, parts)).encode()).hexdigest()
+
+
+def media_type(request):
+    """JSON и browsable API — разные представления одного ресурса."""
+    renderer = getattr(request, 'accepted_renderer', None)
+    return renderer.format if renderer else ''
+
+
+def catalog_etag(name):
+    def etag(request, *args, **kwargs):
+        return make_etag(name, catalog_version(name), media_type(request))
+    return etag
+
+
+def recipe_state(request, pk):
+    """Все, от чего зависит представление рецепта, одним запросом."""
+    if not hasattr(request, '_recipe_state'):
+        state = None
+        if str(pk).isdigit():
+            queryset = Recipe.objects.filter(pk=pk)
+            fields = RECIPE_FIELDS
+            user = request.user
+            if user.is_authenticated:
+                queryset = queryset.annotate(
+                    favorited=Exists(Favorite.objects.filter(
+                        user=user, recipe=OuterRef('pk'))),
+                    in_cart=Exists(ShoppingList.objects.filter(
+                        user=user, recipe=OuterRef('pk'))),
+                    subscribed=Exists(Subscribe.objects.filter(
+                        user=user, author=OuterRef('author'))),
+                )
+                fields += ('favorited', 'in_cart', 'subscribed')
+            state = queryset.values_list(*fields).first()
+        request._recipe_state = state
+    return request._recipe_state
+
+
+def recipe_etag(request, pk=None, **kwargs):
+    state = recipe_state(request, pk)
+    if state is None:
+        return None
+    return make_etag(request.user.pk, *state, catalog_version(TAGS),
+                     catalog_version(INGREDIENTS), media_type(request))
+
+
+def recipe_last_modified(request, pk=None, **kwargs):
+    """Только для анонимов: флаги пользователя не меняют updated_at."""
+    if request.user.is_authenticated:
+        return None
+    state = recipe_state(request, pk)
+    return state and state[0]
+
+
+def catalog_cache(name):
+    """Публичный справочник: кэшируется браузером и nginx и
+    перепроверяется по версии справочника."""
+    return [cache_control(public=True,
+                          max_age=settings.CATALOG_CACHE_MAX_AGE),
+            condition(etag_func=catalog_etag(name))]
+
+
+recipe_cache = [
+    cache_control(private=True, no_cache=True),
+    vary_on_headers('Authorization'),
+    condition(etag_func=recipe_etag, last_modified_func=recipe_last_modified),
+]
@@ -0,0 +1,74 @@
+"""Чтение безопасных запросов API с реплик.
+
+ReplicaMiddleware выбирает для GET/HEAD/OPTIONS к /api/ одну из
+REPLICA_DATABASES на весь запрос, остальные запросы, команды и сигналы
+работают с основной базой. После изменяющего запроса клиент
+(по заголовку Authorization, сессии или адресу из X-Real-IP, который
+выставляет nginx) REPLICA_STICKY_SECONDS секунд читает с основной базы,
+чтобы видеть свои изменения несмотря на отставание реплик. Отметка
+хранится в кэше по умолчанию, поэтому при нескольких процессах нужен
+общий кэш.
+
+Данные, которые сохраняются в кэшах дольше запроса (справочники,
+ленты, кэш ответов), читаются внутри primary(): иначе отстающая реплика
+заполнила бы кэш под уже новой версией старыми данными.
+"""
+import contextvars
+import hashlib
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+
+PRIMARY = 'default'
+PRIMARY_ONLY = {'authtoken.token'}
+
+replica = contextvars.ContextVar('replica', default=None)
+
+
+def client_key(request):
+    client = (request.META.get('HTTP_AUTHORIZATION')
+              or request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+              or request.META.get('HTTP_X_REAL_IP')
+              or request.META.get('REMOTE_ADDR', ''))
+    return f'primary:{hashlib.sha256(client.encode()).hexdigest()}'
+
+
+@contextmanager
+def primary():
+    """Чтение с основной базы, даже если запрос читает с реплики."""
+    token = replica.set(None)
+    try:
+        yield
+    finally:
+        replica.reset(token)
+
+
+def pin_to_primary(request):
+    cache.set(client_key(request), True, settings.REPLICA_STICKY_SECONDS)
+
+
+def pinned(request):
+    return cache.get(client_key(request), False)
+
+
+class ReplicaRouter:
+    """Чтение — с реплики текущего запроса, если она выбрана; токены
+    только что вошедших пользователей могут еще не дойти до реплики,
+    поэтому читаются с основной базы. Запись и миграции — основная
+    база."""
+
+    def db_for_read(self, model, **hints):
+        alias = replica.get()
+        if alias is None or model._meta.label_lower in PRIMARY_ONLY:
+            return PRIMARY
+        return alias
+
+    def db_for_write(self, model, **hints):
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == PRIMARY
@@ -0,0 +1,49 @@
+"""Лента рецептов от авторов, на которых подписан пользователь.
+
+Для каждого подписчика в кэше хранится список id последних рецептов
+(новые первыми). Новый рецепт дописывается в ленты подписчиков автора
+(fan-out on write), лента обрезается до FEED_LENGTH. Если ленты нет
+в кэше, она собирается из Subscribe и Recipe основной базы при первом
+чтении. В локальном кэше лента хранится не дольше LOCAL_CACHE_TIMEOUT:
+сбросы из других процессов до нее не доходят (см. app.caches).
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+from app.caches import lifetime
+from recipes.models import Recipe
+from recipes.versions import feed_key
+from users.models import Subscribe
+from .db_router import primary
+
+
+def build_timeline(user_id):
+    return list(
+        Recipe.objects.filter(author__subscribing__user_id=user_id)
+        .order_by('-id')
+        .values_list('id', flat=True)[:settings.FEED_LENGTH])
+
+
+def get_timeline(user_id):
+    """id рецептов ленты; при промахе кэша лента пересобирается."""
+    timeline = cache.get(feed_key(user_id))
+    if timeline is None:
+        with primary():
+            timeline = build_timeline(user_id)
+        cache.set(feed_key(user_id), timeline,
+                  lifetime(settings.FEED_TIMEOUT))
+    return timeline
+
+
+def push_recipe(recipe_id, author_id, batch_size=500):
+    """Добавляет рецепт в начало уже собранных лент подписчиков."""
+    followers = (Subscribe.objects.filter(author_id=author_id)
+                 .values_list('user_id', flat=True))
+    keys = [feed_key(user_id) for user_id in followers.iterator()]
+    for start in range(0, len(keys), batch_size):
+        timelines = cache.get_many(keys[start:start + batch_size])
+        cache.set_many({
+            key: [recipe_id, *timeline][:settings.FEED_LENGTH]
+            for key, timeline in timelines.items()
+            if recipe_id not in timeline
+        }, lifetime(settings.FEED_TIMEOUT))
@@ -1,29 +1,47 @@
 from django_filters.rest_framework import FilterSet, filters
 
-from recipes.models import Recipe, Tag
+from recipes.models import Favorite, Recipe, ShoppingList, TagInRecipe
+from recipes.search import search_recipes
+from .catalog import tag_choices, tag_map
 
 
 class RecipeFilter(FilterSet):
-    tags = filters.ModelMultipleChoiceFilter(field_name='tags__slug',
-                                             to_field_name='slug',
-                                             queryset=Tag.objects.all())
+    author = filters.NumberFilter(field_name='author_id')
+    tags = filters.MultipleChoiceFilter(choices=tag_choices,
+                                        method='filter_tags')
     is_favorited = filters.BooleanFilter(
         method='filter_is_favorited_filter')
     is_in_shopping_cart = filters.BooleanFilter(
         method='filter_is_in_shopping_cart_filter')
+    search = filters.CharFilter(method='filter_search')
 
     class Meta:
         model = Recipe
         fields = ('author', 'tags',)
 
+    def filter_tags(self, queryset, name, value):
+        """Рецепты хотя бы с одним из тегов, без дублей."""
+        ids = tag_map.ids()
+        return queryset.filter(pk__in=TagInRecipe.objects.filter(
+            tag_id__in=[ids[slug] for slug in value if slug in ids],
+        ).values('recipe_id'))
+
+    def filter_search(self, queryset, name, value):
+        """Полнотекстовый поиск с сортировкой по релевантности."""
+        if not value.strip():
+            return queryset
+        return search_recipes(queryset, value)
+
     def filter_is_in_shopping_cart_filter(self, queryset, name, value):
         user = self.request.user
         if value and not user.is_anonymous:
-            return queryset.filter(shopping_list__user=user)
+            return queryset.filter(pk__in=ShoppingList.objects.filter(
+                user=user).values('recipe_id'))
         return queryset
 
     def filter_is_favorited_filter(self, queryset, name, value):
         user = self.request.user
         if value and not user.is_anonymous:
-            return queryset.filter(favorite__user=user)
+            return queryset.filter(pk__in=Favorite.objects.filter(
+                user=user).values('recipe_id'))
         return queryset
@@ -0,0 +1,71 @@
+from django.db.models import IntegerField, Value
+
+from recipes.models import Favorite, ShoppingList
+from users.models import Subscribe
+
+FAVORITE = 1
+SHOPPING_CART = 2
+FOLLOWED = 3
+
+
+class UserState:
+    """Избранное, список покупок и подписки текущего пользователя.
+
+    Загружается одним запросом (UNION) на страницу и только для тех
+    объектов, которые сериализуются; недостающие id догружаются так же.
+    """
+
+    def __init__(self, user):
+        self.user = user
+        self.ids = {FAVORITE: set(), SHOPPING_CART: set(), FOLLOWED: set()}
+        self._loaded_recipes = set()
+        self._loaded_authors = set()
+
+    def _part(self, model, field, ids, kind):
+        return model.objects.filter(
+            user=self.user, **{f'{field}__in': ids},
+        ).annotate(
+            kind=Value(kind, output_field=IntegerField()),
+        ).values_list(field, 'kind').order_by()
+
+    def load(self, recipe_ids=(), author_ids=()):
+        recipe_ids = set(recipe_ids) - self._loaded_recipes
+        author_ids = set(author_ids) - self._loaded_authors
+        self._loaded_recipes |= recipe_ids
+        self._loaded_authors |= author_ids
+        if self.user.is_anonymous:
+            return
+        parts = []
+        if recipe_ids:
+            parts.append(self._part(Favorite, 'recipe_id', recipe_ids,
+                                    FAVORITE))
+            parts.append(self._part(ShoppingList, 'recipe_id', recipe_ids,
+                                    SHOPPING_CART))
+        if author_ids:
+            parts.append(self._part(Subscribe, 'author_id', author_ids,
+                                    FOLLOWED))
+        if not parts:
+            return
+        for object_id, kind in parts[0].union(*parts[1:], all=True):
+            self.ids[kind].add(object_id)
+
+    def is_favorited(self, recipe_id):
+        self.load(recipe_ids=[recipe_id])
+        return recipe_id in self.ids[FAVORITE]
+
+    def is_in_shopping_cart(self, recipe_id):
+        self.load(recipe_ids=[recipe_id])
+        return recipe_id in self.ids[SHOPPING_CART]
+
+    def is_subscribed(self, author_id):
+        self.load(author_ids=[author_id])
+        return author_id in self.ids[FOLLOWED]
+
+
+def user_state(request):
+    """Общий для всех сериализаторов запроса UserState."""
+    state = getattr(request, '_user_state', None)
+    if state is None or state.user != request.user:
+        state = UserState(request.user)
+        request._user_state = state
+    return state
@@ -0,0 +1,174 @@
+import http.client
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.authtoken.models import Token
+
+from api.utils import percentile
+from recipes.models import Favorite, Recipe
+from users.models import Subscribe, User
+
+SERVERS = {
+    'wsgi': ['app.wsgi:application'],
+    'asgi': ['app.asgi:application', '-k', 'uvicorn.workers.UvicornWorker'],
+}
+SCENARIOS = ('tags', 'ingredients', 'favorite', 'subscribe')
+GUNICORN = 'from gunicorn.app.wsgiapp import run; run()'
+BENCHMARK_USER = 'benchmark'
+START_TIMEOUT = 30
+
+
+class Worker(threading.Thread):
+    """Поток-клиент с постоянным соединением: запросы по кругу до
+    истечения времени. Первый круг прогревает процесс сервера и не
+    учитывается."""
+
+    def __init__(self, port, requests, headers, deadline):
+        super().__init__(daemon=True)
+        self.port = port
+        self.requests = requests
+        self.headers = headers
+        self.deadline = deadline
+        self.latencies = []
+        self.errors = 0
+        self.started = deadline
+
+    def send(self, connection, method, url):
+        connection.request(method, url, headers=self.headers)
+        response = connection.getresponse()
+        response.read()
+        return response.status
+
+    def run(self):
+        connection = http.client.HTTPConnection('127.0.0.1', self.port)
+        for method, url, _ in self.requests:
+            self.send(connection, method, url)
+        self.started = time.monotonic()
+        while time.monotonic() < self.deadline:
+            for method, url, expected in self.requests:
+                started = time.perf_counter()
+                try:
+                    code = self.send(connection, method, url)
+                except (OSError, http.client.HTTPException):
+                    connection.close()
+                    self.errors += 1
+                    continue
+                self.latencies.append(time.perf_counter() - started)
+                if code != expected:
+                    self.errors += 1
+        connection.close()
+
+
+class Command(BaseCommand):
+    help = ('Сравнение пропускной способности и задержек WSGI (gunicorn) '
+            'и ASGI (gunicorn + uvicorn) на частых легких эндпоинтах')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--servers', nargs='+', choices=SERVERS,
+                            default=list(SERVERS))
+        parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS,
+                            default=list(SCENARIOS))
+        parser.add_argument('--workers', type=int, default=2,
+                            help='Процессов сервера')
+        parser.add_argument('--concurrency', type=int, default=32,
+                            help='Одновременных клиентов')
+        parser.add_argument('--duration', type=float, default=10,
+                            help='Секунд на сценарий')
+        parser.add_argument('--port', type=int, default=8765)
+
+    def handle(self, *args, **options):
+        """Нагрузка идет на базу из настроек: пользователь benchmark
+        создается на время замера и удаляется вместе с его данными."""
+        user, _ = User.objects.get_or_create(
+            username=BENCHMARK_USER,
+            defaults={'email': f'{BENCHMARK_USER}@foodgram.ru'})
+        Favorite.objects.filter(user=user).delete()
+        Subscribe.objects.filter(user=user).delete()
+        token, _ = Token.objects.get_or_create(user=user)
+        try:
+            results = [
+                (server, scenario, *stats)
+                for server in options['servers']
+                for scenario, stats in self.run_server(
+                    server, token.key, user, options)
+            ]
+        finally:
+            user.delete()
+        self.stdout.write(f'{"сервер":6} {"сценарий":12} {"запр/с":>9} '
+                          f'{"p50, мс":>8} {"p99, мс":>8} {"ошибок":>7}')
+        for server, scenario, rps, p50, p99, errors in results:
+            self.stdout.write(f'{server:6} {scenario:12} {rps:9.1f} '
+                              f'{p50 * 1000:8.1f} {p99 * 1000:8.1f} '
+                              f'{errors:7}')
+
+    def run_server(self, server, token, user, options):
+        command = [sys.executable, '-c', GUNICORN, *SERVERS[server],
+                   '--bind', f'127.0.0.1:{options["port"]}',
+                   '--workers', str(options['workers']),
+                   '--log-level', 'warning']
+        process = subprocess.Popen(command)
+        try:
+            self.wait_for_port(options['port'], process)
+            for scenario in options['scenarios']:
+                yield scenario, self.load(
+                    scenario, token, user, options)
+        finally:
+            process.terminate()
+            process.wait()
+
+    def wait_for_port(self, port, process):
+        deadline = time.monotonic() + START_TIMEOUT
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise CommandError('Сервер завершился при запуске')
+            try:
+                socket.create_connection(('127.0.0.1', port), 1).close()
+                return
+            except OSError:
+                time.sleep(0.2)
+        raise CommandError('Сервер не запустился')
+
+    def scenario_requests(self, scenario, number, user):
+        """Запросы одного клиента; изменяющие сценарии работают со
+        своим рецептом или автором и возвращают данные в исходное
+        состояние."""
+        if scenario == 'tags':
+            return [('GET', '/api/tags/', 200)]
+        if scenario == 'ingredients':
+            return [('GET', '/api/ingredients/?name=%D0%B0', 200)]
+        if scenario == 'favorite':
+            recipes = list(Recipe.objects.values_list('id', flat=True))
+            if not recipes:
+                raise CommandError('Нет рецептов для сценария favorite')
+            url = f'/api/recipes/{recipes[number % len(recipes)]}/favorite/'
+            return [('POST', url, 201), ('DELETE', url, 204)]
+        authors = list(User.objects.exclude(pk=user.pk)
+                       .values_list('id', flat=True))
+        if not authors:
+            raise CommandError('Нет авторов для сценария subscribe')
+        url = f'/api/users/{authors[number % len(authors)]}/subscribe/'
+        return [('POST', url, 201), ('DELETE', url, 204)]
+
+    def load(self, scenario, token, user, options):
+        deadline = time.monotonic() + options['duration']
+        headers = {'Authorization': f'Token {token}'}
+        workers = [Worker(options['port'],
+                          self.scenario_requests(scenario, number, user),
+                          headers, deadline)
+                   for number in range(options['concurrency'])]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        throughput = sum(
+            len(worker.latencies) / max(deadline - worker.started, 1e-6)
+            for worker in workers)
+        latencies = sorted(latency for worker in workers
+                           for latency in worker.latencies)
+        return (throughput, percentile(latencies, 50),
+                percentile(latencies, 99),
+                sum(worker.errors for worker in workers))
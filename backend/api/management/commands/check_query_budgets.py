@@ -0,0 +1,332 @@
+import difflib
+import os
+import re
+import tempfile
+from collections import namedtuple
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import (CaptureQueriesContext, override_settings,
+                               setup_test_environment,
+                               teardown_test_environment)
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.catalog import ingredient_index, tag_map
+from api.feed import get_timeline
+from app.caches import is_shared
+from recipes.models import (Favorite, Ingredient, IngredientInRecipe, Recipe,
+                            ShoppingList, Tag)
+from users.models import Subscribe, User
+
+LARGE_TABLES = (
+    'recipes_recipe',
+    'recipes_ingredientinrecipe',
+    'recipes_taginrecipe',
+    'recipes_favorite',
+    'recipes_shoppinglist',
+    'users_subscribe',
+    'authtoken_token',
+)
+IMAGE = ('data:image/gif;base64,'
+         'R0lGODlhAQABAIAAAAAAAP///yH5BAEAAAAALAAAAAABAAEAAAIBRAA7')
+
+Case = namedtuple('Case', 'name method url user budget data scan_allowed')
+Case.__new__.__defaults__ = (None, ())
+
+CASES = (
+    Case('ingredients', 'get', '/api/ingredients/?name=ингр', 'anon', 0),
+    Case('ingredient', 'get', '/api/ingredients/{ingredient}/', 'anon', 1),
+    Case('tags', 'get', '/api/tags/', 'anon', 1),
+    Case('tag', 'get', '/api/tags/{tag}/', 'anon', 1),
+    Case('recipes anon', 'get', '/api/recipes/?limit={limit}', 'anon', 4,
+         scan_allowed=('recipes_recipe',)),
+    Case('recipes', 'get', '/api/recipes/?limit={limit}', 'reader', 5,
+         scan_allowed=('recipes_recipe',)),
+    Case('recipes by tags', 'get',
+         '/api/recipes/?limit={limit}&tags=breakfast&tags=dinner',
+         'reader', 5),
+    Case('recipes by author', 'get',
+         '/api/recipes/?limit={limit}&author={author}', 'reader', 5),
+    Case('recipes favorited', 'get',
+         '/api/recipes/?limit={limit}&is_favorited=1', 'reader', 5),
+    Case('recipes in cart', 'get',
+         '/api/recipes/?limit={limit}&is_in_shopping_cart=1', 'reader', 5),
+    Case('recipes search', 'get', '/api/recipes/?limit={limit}&search=суп',
+         'reader', 5),
+    Case('recipes cursor', 'get', '/api/recipes/?limit={limit}&cursor=',
+         'reader', 4, scan_allowed=('recipes_recipe',)),
+    Case('recipe', 'get', '/api/recipes/{recipe}/', 'reader', 6),
+    Case('feed', 'get', '/api/recipes/feed/?limit={limit}', 'reader', 5),
+    Case('recipe create', 'post', '/api/recipes/', 'reader', 25,
+         data='recipe'),
+    Case('recipe update', 'patch', '/api/recipes/{own_recipe}/', 'reader',
+         26, data='recipe'),
+    Case('favorite add', 'post', '/api/recipes/{recipe}/favorite/',
+         'reader', 5),
+    Case('favorite remove', 'delete', '/api/recipes/{recipe}/favorite/',
+         'reader', 5),
+    Case('cart add', 'post', '/api/recipes/{recipe}/shopping_cart/',
+         'reader', 5),
+    Case('cart remove', 'delete', '/api/recipes/{recipe}/shopping_cart/',
+         'reader', 5),
+    Case('favorites batch add', 'post', '/api/recipes/favorite/', 'reader',
+         4, data='recipes'),
+    Case('favorites batch remove', 'delete', '/api/recipes/favorite/',
+         'reader', 4, data='recipes'),
+    Case('cart batch add', 'post', '/api/recipes/shopping_cart/', 'reader',
+         4, data='recipes'),
+    Case('cart batch remove', 'delete', '/api/recipes/shopping_cart/',
+         'reader', 4, data='recipes'),
+    Case('download shopping cart', 'get',
+         '/api/recipes/download_shopping_cart/', 'reader', 1),
+    Case('users', 'get', '/api/users/?limit={limit}', 'reader', 3),
+    Case('user', 'get', '/api/users/{author}/', 'reader', 2),
+    Case('me', 'get', '/api/users/me/', 'reader', 1),
+    Case('subscriptions', 'get',
+         '/api/users/subscriptions/?limit={limit}&recipes_limit=3',
+         'reader', 4),
+    Case('subscribe', 'post', '/api/users/{author}/subscribe/', 'reader', 7),
+    Case('unsubscribe', 'delete', '/api/users/{author}/subscribe/',
+         'reader', 5),
+)
+PAGE_SIZES = (6, 50)
+FULL_SCAN = {
+    'postgresql': re.compile(r'Seq Scan on (\w+)'),
+    'sqlite': re.compile(r'\bSCAN (?:TABLE )?(\w+)'),
+}
+
+LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+LITERAL_LIST = re.compile(r'\?(?:, \?)+')
+
+
+def normalize(sql):
+    """SQL без значений параметров, чтобы снимки не зависели от данных."""
+    return LITERAL_LIST.sub('?, ...', LITERAL.sub('?', sql))
+
+
+def unfiltered(sql):
+    """Запрос ко всей таблице: подсчет строк или страница с LIMIT."""
+    sql = sql.upper()
+    return ' WHERE ' not in sql and (' LIMIT ' in sql or 'COUNT(' in sql)
+
+
+class Command(BaseCommand):
+    help = ('Проверка числа SQL-запросов и планов запросов для каждого '
+            'эндпоинта API на тестовой базе')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--plans-dir', default=None,
+            help='Каталог со снимками EXPLAIN; изменившийся или '
+                 'отсутствующий план считается нарушением')
+        parser.add_argument(
+            '--update-plans', action='store_true',
+            help='Перезаписать снимки планов в --plans-dir')
+        parser.add_argument(
+            '--recipes', type=int, default=120,
+            help='Количество рецептов в тестовых данных')
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False)
+        try:
+            with tempfile.TemporaryDirectory() as directory:
+                with override_settings(
+                        MEDIA_ROOT=os.path.join(directory, 'media'),
+                        CACHES=self.shared_caches(directory),
+                        REPLICA_DATABASES=[]):
+                    errors = self.check_budgets(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+        if errors:
+            for error in errors:
+                self.stderr.write(error)
+            raise CommandError(f'Нарушений: {len(errors)}')
+        self.stdout.write(self.style.SUCCESS('Все бюджеты соблюдены'))
+
+    def shared_caches(self, directory):
+        """Бюджеты считаются для рабочего процесса с общим кэшем по
+        умолчанию, как в рабочем окружении."""
+        caches = dict(settings.CACHES)
+        if not is_shared():
+            caches['default'] = {
+                'BACKEND': 'django.core.cache.backends.filebased.'
+                           'FileBasedCache',
+                'LOCATION': os.path.join(directory, 'cache'),
+            }
+        return caches
+
+    def check_budgets(self, options):
+        """Справочники в памяти, лента и кэш токенов прогреваются
+        заранее: бюджеты считаются для рабочего процесса, а не для
+        первого запроса."""
+        context = self.seed(options['recipes'])
+        ingredient_index.all()
+        tag_map.ids()
+        get_timeline(context['reader'])
+        clients = {'anon': APIClient(), 'reader': APIClient()}
+        clients['reader'].credentials(
+            HTTP_AUTHORIZATION=f'Token {context.pop("token")}')
+        clients['reader'].get('/api/users/me/')
+        plans_dir = options['plans_dir'] and Path(options['plans_dir'])
+        if options['update_plans'] and not plans_dir:
+            raise CommandError('--update-plans требует --plans-dir')
+        errors = []
+        for case in CASES:
+            counts = set()
+            for limit in PAGE_SIZES:
+                url = case.url.format(limit=limit, **context)
+                data = case.data and getattr(self, f'{case.data}_payload')(
+                    context)
+                with CaptureQueriesContext(connection) as queries:
+                    response = getattr(clients[case.user], case.method)(
+                        url, data, format='json')
+                if response.status_code >= 400:
+                    errors.append(f'{case.name}: {url} вернул '
+                                  f'{response.status_code}')
+                counts.add(len(queries))
+                if '{limit}' not in case.url:
+                    break
+            self.stdout.write(f'{case.name:25} запросов: '
+                              f'{", ".join(map(str, sorted(counts)))} '
+                              f'(бюджет {case.budget})')
+            if max(counts) > case.budget:
+                errors.append(f'{case.name}: {max(counts)} запросов при '
+                              f'бюджете {case.budget}')
+            if len(counts) > 1:
+                errors.append(f'{case.name}: число запросов зависит от '
+                              f'размера страницы {sorted(counts)}')
+            errors.extend(self.check_plans(
+                case, queries, plans_dir, options['update_plans']))
+        return errors
+
+    def check_plans(self, case, queries, plans_dir, update):
+        """EXPLAIN для каждого SELECT: полный просмотр больших таблиц
+        допускается только для перечисленных в scan_allowed и только в
+        запросах без условий — подсчете всех строк или странице в
+        порядке индекса."""
+        pattern = FULL_SCAN.get(connection.vendor)
+        if pattern is None:
+            return []
+        errors, plans = [], []
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute('SET enable_seqscan = off')
+            for query in queries.captured_queries:
+                sql = query['sql']
+                if not sql.lstrip().upper().startswith('SELECT'):
+                    continue
+                plan = self.explain(cursor, sql)
+                plans.append(f'{normalize(sql)}\n{plan}\n')
+                for table in pattern.findall(plan):
+                    if table in LARGE_TABLES and not (
+                            table in case.scan_allowed and unfiltered(sql)):
+                        errors.append(f'{case.name}: полный просмотр '
+                                      f'{table}\n  {sql}\n{plan}')
+            if connection.vendor == 'postgresql':
+                cursor.execute('RESET enable_seqscan')
+        if plans_dir:
+            errors.extend(self.snapshot(
+                plans_dir, case, '\n'.join(plans), update))
+        return errors
+
+    def explain(self, cursor, sql):
+        if connection.vendor == 'postgresql':
+            cursor.execute(f'EXPLAIN {sql}')
+            return '\n'.join(row[0] for row in cursor.fetchall())
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+        return '\n'.join(row[-1] for row in cursor.fetchall())
+
+    def snapshot(self, plans_dir, case, plans, update):
+        """Сверка планов со снимком в репозитории; --update-plans
+        записывает текущие планы вместо сверки."""
+        path = plans_dir / f'{connection.vendor}-{case.name}.txt'.replace(
+            ' ', '_')
+        if update:
+            plans_dir.mkdir(parents=True, exist_ok=True)
+            path.write_text(plans, encoding='utf8')
+            return []
+        if not path.exists():
+            return [f'{case.name}: нет снимка планов {path}, запустите '
+                    f'команду с --update-plans']
+        expected = path.read_text(encoding='utf8')
+        if expected == plans:
+            return []
+        diff = difflib.unified_diff(
+            expected.splitlines(), plans.splitlines(),
+            str(path), 'текущий план', lineterm='')
+        return [f'{case.name}: план запросов изменился\n' + '\n'.join(diff)]
+
+    def recipes_payload(self, context):
+        return {'recipes': context['recipe_ids']}
+
+    def recipe_payload(self, context):
+        return {
+            'name': 'Проверка бюджета',
+            'text': 'Описание',
+            'cooking_time': 10,
+            'image': IMAGE,
+            'tags': context['tag_ids'],
+            'ingredients': [{'id': ingredient_id, 'amount': 10}
+                            for ingredient_id in context['ingredient_ids']],
+        }
+
+    def seed(self, total):
+        """Небольшой, но не вырожденный набор данных."""
+        authors = [User.objects.create(username=f'author{number}',
+                                       email=f'author{number}@foodgram.ru')
+                   for number in range(10)]
+        reader = User.objects.create_user(
+            username='reader', email='reader@foodgram.ru',
+            password='budget-password')
+        tags = [Tag.objects.create(name=slug, slug=slug, color=color)
+                for slug, color in (('breakfast', '#E26C2D'),
+                                    ('lunch', '#49B64E'),
+                                    ('dinner', '#8775D2'))]
+        ingredients = [Ingredient.objects.create(
+            name=f'ингредиент {number}', measurement_unit='г')
+            for number in range(60)]
+        for number in range(total):
+            recipe = Recipe.objects.create(
+                author=authors[number % len(authors)],
+                name=f'Суп {number}' if number % 4 else f'Салат {number}',
+                text='Нарезать и смешать', cooking_time=10 + number % 30,
+                image='images/big_303333.jpg')
+            recipe.tags.set(tags[: 1 + number % len(tags)])
+            IngredientInRecipe.objects.bulk_create(
+                [IngredientInRecipe(recipe=recipe, ingredient=ingredient,
+                                    amount=number % 7 + 1)
+                 for ingredient in ingredients[number % 50:
+                                               number % 50 + 5 + number % 8]])
+            if number % 3 == 0:
+                Favorite.objects.create(user=reader, recipe=recipe)
+            if number % 5 == 0:
+                ShoppingList.objects.create(user=reader, recipe=recipe)
+        Subscribe.objects.bulk_create(
+            [Subscribe(user=reader, author=author)
+             for author in authors[1:]])
+        own_recipe = Recipe.objects.create(
+            author=reader, name='Свой рецепт', text='Описание',
+            cooking_time=5, image='images/big_303333.jpg')
+        recipe = Recipe.objects.exclude(author=reader).first()
+        Favorite.objects.filter(user=reader, recipe=recipe).delete()
+        ShoppingList.objects.filter(user=reader, recipe=recipe).delete()
+        return {
+            'token': Token.objects.create(user=reader).key,
+            'reader': reader.id,
+            'author': authors[0].id,
+            'recipe': recipe.id,
+            'recipe_ids': list(Recipe.objects.exclude(author=reader)
+                               .values_list('id', flat=True)[:20]),
+            'own_recipe': own_recipe.id,
+            'ingredient': ingredients[0].id,
+            'ingredient_ids': [ingredient.id
+                               for ingredient in ingredients[:6]],
+            'tag': tags[0].id,
+            'tag_ids': [tag.id for tag in tags[:2]],
+        }
@@ -0,0 +1,271 @@
+import json
+import random
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api import actions
+from api.catalog import tag_map
+from api.utils import percentile
+from recipes.models import (Favorite, Ingredient, Recipe, ShoppingList,
+                            TagInRecipe)
+from users.models import Subscribe, User
+
+LOAD_USER = 'loadtest'
+RECIPES_POOL = 1000
+FAVORITES = 20
+IN_CART = 5
+SUBSCRIPTIONS = 5
+MIX = {
+    'browse': 30,
+    'browse_favorited': 15,
+    'autocomplete': 25,
+    'subscriptions': 12,
+    'cart': 12,
+    'download': 6,
+}
+SHARES = (50, 95, 99)
+
+
+class Worker(threading.Thread):
+    """Поток со своим клиентом, пользователем и соединением с базой:
+    сценарии выбираются по весам до истечения времени. Для каждого
+    успешного запроса сохраняются задержка и число SQL-запросов,
+    неудачные (неожиданный код ответа или исключение) только
+    считаются: быстрые ответы с ошибкой не должны улучшать задержки."""
+
+    def __init__(self, command, token, seed, deadline):
+        super().__init__(daemon=True)
+        self.command = command
+        self.random = random.Random(seed)
+        self.deadline = deadline
+        self.anon = APIClient(raise_request_exception=False)
+        self.client = APIClient(raise_request_exception=False)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token}')
+        self.samples = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.queries = 0
+
+    def count(self, execute, sql, params, many, context):
+        self.queries += 1
+        return execute(sql, params, many, context)
+
+    def send(self, name, client, method, url, expected):
+        self.queries = 0
+        started = time.perf_counter()
+        try:
+            response = getattr(client, method)(url)
+        except Exception:
+            self.errors[name] += 1
+            return
+        elapsed = time.perf_counter() - started
+        if response.status_code != expected:
+            self.errors[name] += 1
+            return
+        self.samples[name].append((elapsed, self.queries))
+
+    def run(self):
+        scenarios = list(self.command.mix)
+        weights = [self.command.mix[scenario] for scenario in scenarios]
+        try:
+            with connection.execute_wrapper(self.count):
+                while time.monotonic() < self.deadline:
+                    scenario = self.random.choices(scenarios, weights)[0]
+                    for request in self.command.scenario_requests(
+                            scenario, self):
+                        self.send(*request)
+        finally:
+            connection.close()
+
+
+class Command(BaseCommand):
+    help = ('Нагрузочный прогон смеси запросов к API внутри процесса на '
+            'базе из настроек: запросы в секунду, p50/p95/p99 и число '
+            'SQL-запросов по эндпоинтам')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--duration', type=float, default=30,
+                            help='Секунд нагрузки')
+        parser.add_argument('--concurrency', type=int, default=4,
+                            help='Одновременных клиентов')
+        parser.add_argument('--scenarios', nargs='+', choices=MIX,
+                            default=list(MIX))
+        parser.add_argument('--seed', type=int, default=0,
+                            help='Зерно выбора сценариев и данных')
+        parser.add_argument('--output', default=None,
+                            help='Сохранить результаты в json')
+        parser.add_argument('--baseline', default=None,
+                            help='json прошлого прогона для сравнения')
+
+    def handle(self, *args, **options):
+        """Для каждого клиента создается пользователь loadtest с
+        избранным, списком покупок и подписками на популярных авторов;
+        после прогона пользователи удаляются вместе с данными."""
+        self.mix = {scenario: MIX[scenario]
+                    for scenario in options['scenarios']}
+        if connection.vendor == 'sqlite' and options['concurrency'] > 1:
+            # Параллельные записи в SQLite завершаются ошибкой
+            # «database is locked», а не ожиданием.
+            self.stderr.write(self.style.WARNING(
+                'SQLite не поддерживает параллельную запись: прогон в '
+                'один поток'))
+            options['concurrency'] = 1
+        self.prepare_data(options['seed'])
+        users = [self.create_user(number)
+                 for number in range(options['concurrency'])]
+        try:
+            self.warm_up(users)
+            started = time.monotonic()
+            workers = [Worker(self, token, options['seed'] + number,
+                              started + options['duration'])
+                       for number, (_, token) in enumerate(users)]
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+            elapsed = time.monotonic() - started
+        finally:
+            for user, _ in users:
+                user.delete()
+        results = self.summarize(workers, elapsed)
+        baseline = {}
+        if options['baseline']:
+            with open(options['baseline'], encoding='utf8') as file:
+                baseline = json.load(file)
+        self.report(results, baseline)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf8') as file:
+                json.dump(results, file, ensure_ascii=False, indent=2)
+
+    def prepare_data(self, seed):
+        """Рецепты для корзины и избранного — из самых популярных,
+        теги — с числом страниц, авторы — с наибольшим числом
+        подписчиков."""
+        data_random = random.Random(seed)
+        recipes = list(Recipe.objects.values_list('id', flat=True)
+                       .order_by('-favorites_count')[:RECIPES_POOL])
+        if len(recipes) <= IN_CART:
+            raise CommandError('Недостаточно рецептов для прогона')
+        data_random.shuffle(recipes)
+        self.recipes = recipes
+        page_size = settings.REST_FRAMEWORK['PAGE_SIZE']
+        self.tag_pages = {
+            slug: (count - 1) // page_size + 1
+            for slug, count in TagInRecipe.objects.filter(
+                tag__slug__in=tag_map.ids()).values_list('tag__slug')
+            .annotate(count=Count('id')).order_by('tag__slug')}
+        if not self.tag_pages:
+            raise CommandError('Нет рецептов с тегами')
+        names = Ingredient.objects.values_list('name', flat=True)[:200]
+        self.prefixes = sorted({name[:2].lower() for name in names}) or ['']
+        self.authors = list(User.objects.order_by('-followers_count')
+                            .values_list('id', flat=True)[:SUBSCRIPTIONS])
+
+    def create_user(self, number):
+        user, _ = User.objects.get_or_create(
+            username=f'{LOAD_USER}{number}',
+            defaults={'email': f'{LOAD_USER}{number}@foodgram.ru'})
+        Favorite.objects.filter(user=user).delete()
+        ShoppingList.objects.filter(user=user).delete()
+        Subscribe.objects.filter(user=user).delete()
+        actions.add_recipes(Favorite, user, self.recipes[:FAVORITES])
+        actions.add_recipes(ShoppingList, user, self.recipes[:IN_CART])
+        for author in self.authors:
+            if author != user.id:
+                Subscribe.objects.create(user=user, author_id=author)
+        return user, Token.objects.get_or_create(user=user)[0].key
+
+    def warm_up(self, users):
+        """Один проход всех сценариев до замера: справочники, кэш
+        токенов и шрифт загружаются до начала отсчета."""
+        worker = Worker(self, users[0][1], 0, 0)
+        for scenario in self.mix:
+            for request in self.scenario_requests(scenario, worker):
+                worker.send(*request)
+
+    def scenario_requests(self, scenario, worker):
+        """Запросы сценария: (эндпоинт, клиент, метод, url, код)."""
+        choice = worker.random.choice
+        if scenario == 'browse':
+            tag = choice(sorted(self.tag_pages))
+            page = worker.random.randint(1, min(self.tag_pages[tag], 10))
+            return [('recipes anon', worker.anon, 'get',
+                     f'/api/recipes/?page={page}&tags={tag}', 200)]
+        if scenario == 'browse_favorited':
+            return [('recipes favorited', worker.client, 'get',
+                     '/api/recipes/?is_favorited=1', 200)]
+        if scenario == 'autocomplete':
+            return [('ingredients', worker.anon, 'get',
+                     f'/api/ingredients/?name={choice(self.prefixes)}', 200)]
+        if scenario == 'subscriptions':
+            return [('subscriptions', worker.client, 'get',
+                     '/api/users/subscriptions/?recipes_limit=3', 200)]
+        if scenario == 'cart':
+            recipe = choice(self.recipes[IN_CART:])
+            url = f'/api/recipes/{recipe}/shopping_cart/'
+            return [('cart add', worker.client, 'post', url, 201),
+                    ('cart remove', worker.client, 'delete', url, 204)]
+        return [('download cart', worker.client, 'get',
+                 '/api/recipes/download_shopping_cart/', 200)]
+
+    def summarize(self, workers, elapsed):
+        samples, errors = defaultdict(list), defaultdict(int)
+        for worker in workers:
+            for name, values in worker.samples.items():
+                samples[name].extend(values)
+            for name, count in worker.errors.items():
+                errors[name] += count
+        results = {}
+        for name in sorted(set(samples) | set(errors)):
+            values = samples[name]
+            latencies = sorted(latency for latency, _ in values)
+            queries = [count for _, count in values] or [0]
+            results[name] = {
+                'requests': len(values),
+                'rps': len(values) / max(elapsed, 1e-6),
+                **{f'p{share}': percentile(latencies, share)
+                   if latencies else None for share in SHARES},
+                'queries': sum(queries) / len(queries),
+                'max_queries': max(queries),
+                'errors': errors[name],
+            }
+        return results
+
+    def report(self, results, baseline):
+        self.stdout.write(
+            f'{"эндпоинт":18} {"запросов":>8} {"запр/с":>8} '
+            f'{"p50, мс":>8} {"p95, мс":>8} {"p99, мс":>8} '
+            f'{"SQL":>6} {"ошибок":>6}')
+        for name, result in results.items():
+            self.stdout.write(
+                f'{name:18} {result["requests"]:8} {result["rps"]:8.1f} '
+                + ' '.join(milliseconds(result[f'p{share}'])
+                           for share in SHARES)
+                + f' {result["queries"]:6.1f} {result["errors"]:6}')
+            before = baseline.get(name)
+            if before:
+                self.stdout.write(
+                    f'{"  к прошлому":18} {"":8} '
+                    f'{change(result["rps"], before["rps"]):>8} '
+                    + ' '.join(f'{change(result[key], before[key]):>8}'
+                               for key in (f'p{share}' for share in SHARES))
+                    + f' {result["queries"] - before["queries"]:+6.1f}')
+
+
+def milliseconds(value):
+    """Перцентиль в мс; прочерк, если успешных запросов не было."""
+    return '—'.rjust(8) if value is None else f'{value * 1000:8.1f}'
+
+
+def change(value, before):
+    """Изменение относительно прошлого прогона в процентах."""
+    if value is None or not before:
+        return '—'
+    return f'{(value - before) / before * 100:+.0f}%'
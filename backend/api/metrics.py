@@ -0,0 +1,202 @@
+"""Метрики запросов: время SQL, сериализации и рендеринга, размер
+ответа.
+
+Данные текущего запроса хранятся в RequestMetrics (contextvar, поэтому
+доступны и из потоков sync_to_async в режиме ASGI), гистограммы по
+эндпоинтам — в памяти процесса. /metrics отдает их в текстовом формате
+Prometheus; при нескольких процессах gunicorn каждый процесс
+показывает свои значения, Prometheus различает их по instance.
+SQL-запросы учитывает обертка record_query, которая ставится на каждое
+соединение при его открытии.
+"""
+import contextvars
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from rest_framework.serializers import ListSerializer
+
+from .response_cache import stats
+from .warmup import startup
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+current = contextvars.ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    """Время по этапам и SQL-запросы одного запроса."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.timings = defaultdict(float)
+        self.queries = []
+        self.serializing = False
+
+    def execute(self, execute, sql, params, many, context):
+        """Время каждого SQL-запроса (см. record_query)."""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started
+            self.queries.append((duration, sql))
+            self.timings['db'] += duration
+
+    @property
+    def total(self):
+        return time.perf_counter() - self.started
+
+    def slowest(self, count):
+        return sorted(self.queries, key=lambda query: query[0],
+                      reverse=True)[:count]
+
+
+def record_query(execute, sql, params, many, context):
+    """Обертка выполнения SQL на всех соединениях: запрос учитывается
+    в метриках текущего запроса, если он есть. Соединения принадлежат
+    потокам, а контекст запроса копируется в потоки sync_to_async,
+    поэтому так учитываются и запросы view под ASGI."""
+    metrics = current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    return metrics.execute(execute, sql, params, many, context)
+
+
+def track_connection(sender, connection, **kwargs):
+    """connection_created: обертка ставится первой и один раз на
+    объект соединения, даже если он переподключается. Первой — чтобы
+    не мешать execute_wrapper(), который снимает последнюю обертку."""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, record_query)
+
+
+@contextmanager
+def timed(stage):
+    """Добавляет время блока к этапу текущего запроса."""
+    metrics = current.get()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        if metrics is not None:
+            metrics.timings[stage] += time.perf_counter() - started
+
+
+class TimedSerializerMixin:
+    """Время сериализации для сериализаторов API: учитывается только
+    внешний вызов .data, вложенные сериализаторы входят в него."""
+
+    @property
+    def data(self):
+        metrics = current.get()
+        if metrics is None or metrics.serializing:
+            return super().data
+        metrics.serializing = True
+        try:
+            with timed('serialize'):
+                return super().data
+        finally:
+            metrics.serializing = False
+
+
+class TimedListSerializer(TimedSerializerMixin, ListSerializer):
+    """Список с учетом времени сериализации (many=True)."""
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+
+
+class Registry:
+    """Гистограммы и счетчики по (эндпоинт, метод) одного процесса."""
+
+    histograms = {
+        'duration_seconds': ('Время обработки запроса', BUCKETS),
+        'db_seconds': ('Время SQL-запросов', BUCKETS),
+        'serialize_seconds': ('Время сериализации', BUCKETS),
+        'render_seconds': ('Время рендеринга ответа', BUCKETS),
+        'queries': ('SQL-запросов на запрос', QUERY_BUCKETS),
+        'response_bytes': ('Размер ответа', SIZE_BUCKETS),
+    }
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._statuses = defaultdict(int)
+
+    def observe(self, view, method, status, values):
+        key = (view, method)
+        with self._lock:
+            self._statuses[(view, method, status)] += 1
+            for name, (_, buckets) in self.histograms.items():
+                histogram = self._histograms.setdefault(
+                    (name, key), Histogram(buckets))
+                histogram.observe(values[name])
+
+    def exposition(self):
+        """Текст в формате Prometheus 0.0.4."""
+        lines = []
+        with self._lock:
+            lines.extend(self.status_lines())
+            for name, (description, _) in self.histograms.items():
+                lines.extend(self.histogram_lines(name, description))
+        lines.extend(cache_lines())
+        lines.extend(startup_lines())
+        return '\n'.join(lines) + '\n'
+
+    def status_lines(self):
+        yield '# HELP foodgram_requests_total Обработано запросов'
+        yield '# TYPE foodgram_requests_total counter'
+        for (view, method, status), count in sorted(self._statuses.items()):
+            yield (f'foodgram_requests_total{{view="{view}",'
+                   f'method="{method}",status="{status}"}} {count}')
+
+    def histogram_lines(self, name, description):
+        metric = f'foodgram_request_{name}'
+        yield f'# HELP {metric} {description}'
+        yield f'# TYPE {metric} histogram'
+        for (histogram_name, (view, method)), histogram in sorted(
+                self._histograms.items()):
+            if histogram_name != name:
+                continue
+            labels = f'view="{view}",method="{method}"'
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                yield f'{metric}_bucket{{{labels},le="{bound}"}} {count}'
+            yield f'{metric}_bucket{{{labels},le="+Inf"}} {histogram.count}'
+            yield f'{metric}_sum{{{labels}}} {histogram.sum}'
+            yield f'{metric}_count{{{labels}}} {histogram.count}'
+
+
+def cache_lines():
+    """Счетчики кэша ответов (общие для процессов при общем бэкенде)."""
+    values = stats()
+    for name in ('hits', 'misses', 'evictions'):
+        if values[name] is not None:
+            metric = f'foodgram_response_cache_{name}'
+            yield f'# TYPE {metric} gauge'
+            yield f'{metric} {values[name]}'
+
+
+def startup_lines():
+    yield '# HELP foodgram_startup_seconds Время этапов запуска процесса'
+    yield '# TYPE foodgram_startup_seconds gauge'
+    for step, seconds in startup.items():
+        yield f'foodgram_startup_seconds{{step="{step}"}} {seconds}'
+
+
+registry = Registry()
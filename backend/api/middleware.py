@@ -0,0 +1,202 @@
+import asyncio
+import cProfile
+import logging
+import random
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from rest_framework.permissions import SAFE_METHODS
+
+from .db_router import pin_to_primary, pinned, replica
+from .metrics import RequestMetrics, current, registry
+from .profiling import (profile_requested, requested_by, sampled,
+                        save_profile)
+
+logger = logging.getLogger(__name__)
+
+
+class HybridMiddleware:
+    """Middleware для WSGI и ASGI: под ASGI цепочка middleware остается
+    асинхронной и не переключается в общий поток синхронного кода на
+    каждом запросе. Подклассы реализуют __call__ для синхронной цепочки
+    и __acall__ для асинхронной."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # Так Django 3.2 (MiddlewareMixin) помечает экземпляр
+            # корутинной функцией для обработчика запросов.
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        return self.call(request)
+
+
+class MetricsMiddleware(HybridMiddleware):
+    """Время SQL, сериализации и рендеринга каждого запроса: заголовок
+    Server-Timing, журнал медленных запросов и гистограммы для
+    /metrics. Стоит первым, чтобы общее время включало остальные
+    middleware. SQL-запросы учитывает api.metrics.record_query."""
+
+    def call(self, request):
+        metrics = RequestMetrics()
+        token = current.set(metrics)
+        try:
+            response = self.get_response(request)
+        finally:
+            current.reset(token)
+        self.finish(request, response, metrics)
+        return response
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = current.set(metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current.reset(token)
+        self.finish(request, response, metrics)
+        return response
+
+    def process_template_response(self, request, response):
+        """Ответы DRF рендерятся после view: время до конца рендеринга
+        учитывается отдельно."""
+        metrics = current.get()
+        started = time.perf_counter()
+
+        def rendered(response):
+            metrics.timings['render'] += time.perf_counter() - started
+
+        if metrics is not None:
+            response.add_post_render_callback(rendered)
+        return response
+
+    def finish(self, request, response, metrics):
+        total = metrics.total
+        match = request.resolver_match
+        view = match.view_name if match else 'unmatched'
+        size = 0 if response.streaming else len(response.content)
+        timings = metrics.timings
+        response['Server-Timing'] = ', '.join((
+            f'db;dur={timings["db"] * 1000:.1f};'
+            f'desc="{len(metrics.queries)} SQL"',
+            f'serialize;dur={timings["serialize"] * 1000:.1f}',
+            f'render;dur={timings["render"] * 1000:.1f}',
+            f'total;dur={total * 1000:.1f}',
+        ))
+        registry.observe(view, request.method, response.status_code, {
+            'duration_seconds': total,
+            'db_seconds': timings['db'],
+            'serialize_seconds': timings['serialize'],
+            'render_seconds': timings['render'],
+            'queries': len(metrics.queries),
+            'response_bytes': size,
+        })
+        if total >= settings.SLOW_REQUEST_SECONDS:
+            logger.warning(
+                'Медленный запрос %s %s (%s): %.0f мс, SQL %d за %.0f мс, '
+                'ответ %d байт\n%s', request.method, request.get_full_path(),
+                view, total * 1000, len(metrics.queries),
+                timings['db'] * 1000, size,
+                '\n'.join(f'  {duration * 1000:.1f} мс: {sql}'
+                          for duration, sql in metrics.slowest(
+                              settings.SLOW_REQUEST_QUERIES)))
+
+
+class ProfilingMiddleware(HybridMiddleware):
+    """cProfile всего запроса, включая сериализацию и рендеринг, по
+    запросу администратора или по выборке (см. api.profiling). Номер
+    профиля в X-Profile-Id получает только запросивший его
+    администратор."""
+
+    def call(self, request):
+        user = requested_by(request)
+        if user is None and not (settings.PROFILE_SAMPLE_RATE
+                                 and sampled(request)):
+            return self.get_response(request)
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        profiler.enable()
+        try:
+            response = self.get_response(request)
+        finally:
+            profiler.disable()
+        profile = save_profile(profiler, request, response,
+                               time.perf_counter() - started, user)
+        if user is not None:
+            response['X-Profile-Id'] = profile.id
+        return response
+
+    async def __acall__(self, request):
+        """Пользователь и профиль загружаются и сохраняются в потоке
+        синхронного кода, и только для профилируемых запросов."""
+        user = None
+        if profile_requested(request):
+            user = await sync_to_async(requested_by)(request)
+        if user is None and not (settings.PROFILE_SAMPLE_RATE
+                                 and sampled(request)):
+            return await self.get_response(request)
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        profiler.enable()
+        try:
+            response = await self.get_response(request)
+        finally:
+            profiler.disable()
+        profile = await sync_to_async(save_profile)(
+            profiler, request, response, time.perf_counter() - started,
+            user)
+        if user is not None:
+            response['X-Profile-Id'] = profile.id
+        return response
+
+
+class ReplicaMiddleware(HybridMiddleware):
+    """Выбор реплики для безопасных запросов к API и закрепление
+    клиента за основной базой после записи (см. api.db_router).
+    Под ASGI кэш закреплений читается в пуле потоков, а без реплик не
+    читается вовсе."""
+
+    def call(self, request):
+        alias = None
+        if self.reads_replica(request) and not pinned(request):
+            alias = random.choice(settings.REPLICA_DATABASES)
+        token = replica.set(alias)
+        try:
+            response = self.get_response(request)
+        finally:
+            replica.reset(token)
+        if self.pins(request, response):
+            pin_to_primary(request)
+        return response
+
+    async def __acall__(self, request):
+        alias = None
+        if self.reads_replica(request) and not await sync_to_async(
+                pinned, thread_sensitive=False)(request):
+            alias = random.choice(settings.REPLICA_DATABASES)
+        token = replica.set(alias)
+        try:
+            response = await self.get_response(request)
+        finally:
+            replica.reset(token)
+        if self.pins(request, response):
+            await sync_to_async(pin_to_primary,
+                                thread_sensitive=False)(request)
+        return response
+
+    def reads_replica(self, request):
+        return (request.method in SAFE_METHODS
+                and settings.REPLICA_DATABASES
+                and request.path_info.startswith('/api/'))
+
+    def pins(self, request, response):
+        return (request.method not in SAFE_METHODS
+                and settings.REPLICA_DATABASES
+                and response.status_code < 400)
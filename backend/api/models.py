@@ -0,0 +1,44 @@
+from django.conf import settings
+from django.db import models
+
+
+class RequestProfile(models.Model):
+    """Профиль cProfile одного запроса; сам файл лежит в PROFILE_DIR."""
+    created = models.DateTimeField(
+        auto_now_add=True,
+        db_index=True,
+        verbose_name='Дата')
+    method = models.CharField(
+        max_length=10,
+        verbose_name='Метод')
+    path = models.CharField(
+        max_length=2000,
+        verbose_name='Адрес')
+    view = models.CharField(
+        max_length=200,
+        verbose_name='Эндпоинт')
+    status = models.PositiveSmallIntegerField(
+        verbose_name='Код ответа')
+    duration = models.FloatField(
+        verbose_name='Длительность, с')
+    sampled = models.BooleanField(
+        default=False,
+        verbose_name='По выборке')
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name='request_profiles',
+        verbose_name='Пользователь')
+    file = models.CharField(
+        max_length=255,
+        verbose_name='Файл')
+
+    class Meta:
+        ordering = ('-created',)
+        verbose_name = 'Профиль запроса'
+        verbose_name_plural = 'Профили запросов'
+
+    def __str__(self):
+        return f'{self.method} {self.path}'
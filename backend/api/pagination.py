@@ -1,5 +1,66 @@
-from rest_framework.pagination import PageNumberPagination
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+from rest_framework.response import Response
+
+
+def is_unique(model, field_name):
+    """Поле модели с уникальными значениями; аннотации (например,
+    релевантность поиска) уникальными не считаются."""
+    try:
+        field = model._meta.get_field(field_name)
+    except FieldDoesNotExist:
+        return False
+    return field.primary_key or field.unique
+
+
+class LimitCursorPagination(CursorPagination):
+    """Курсорная пагинация по порядку queryset с параметром limit.
+
+    Общее количество считается только по запросу ?count=true. Позиция
+    курсора — значение первого поля сортировки, поэтому сортировка по
+    неуникальному полю (релевантность поиска) отклоняется: страницы
+    теряли бы и повторяли записи с равными значениями.
+    """
+    page_size_query_param = 'limit'
+    count_query_param = 'count'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.ordering = (queryset.query.order_by
+                         or queryset.model._meta.ordering)
+        if not is_unique(queryset.model, self.ordering[0].lstrip('-')):
+            raise ValidationError({self.cursor_query_param: (
+                'Курсорная пагинация недоступна для этой сортировки, '
+                'например с поиском: используйте page')})
+        self.count = None
+        if request.query_params.get(self.count_query_param) in (
+                'true', 'True', '1'):
+            self.count = queryset.count()
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        response = {'next': self.get_next_link(),
+                    'previous': self.get_previous_link(),
+                    'results': data}
+        if self.count is not None:
+            response = {'count': self.count, **response}
+        return Response(response)
 
 
 class CustomPagination(PageNumberPagination):
+    """Постраничная пагинация; с параметром ?cursor= — курсорная."""
     page_size_query_param = "limit"
+    cursor_query_param = 'cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_pagination = None
+        if self.cursor_query_param in request.query_params:
+            self.cursor_pagination = LimitCursorPagination()
+            return self.cursor_pagination.paginate_queryset(
+                queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_pagination is not None:
+            return self.cursor_pagination.get_paginated_response(data)
+        return super().get_paginated_response(data)
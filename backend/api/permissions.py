@@ -21,3 +21,16 @@ class IsAdminOrReadOnly(permissions.BasePermission):
             request.method in permissions.SAFE_METHODS
             or (request.user.is_authenticated and request.user.is_admin)
         )
+
+
+def is_admin(user):
+    """Администратор по роли или суперпользователь."""
+    return bool(user and user.is_authenticated
+                and (user.is_admin or user.is_superuser))
+
+
+class IsAdmin(permissions.BasePermission):
+    message = 'Нужны права администратора'
+
+    def has_permission(self, request, view):
+        return is_admin(request.user)
@@ -0,0 +1,103 @@
+"""Профилирование отдельных запросов cProfile без передеплоя.
+
+Запрос профилируется, если администратор (роль admin или
+суперпользователь, по токену или сессии) передал заголовок X-Profile: 1
+или параметр ?profile=1, либо если его эндпоинт есть в PROFILE_ROUTES и
+запрос попал в долю PROFILE_SAMPLE_RATE. Профили пишутся в PROFILE_DIR,
+хранятся последние PROFILE_KEEP, список доступен в админке. cProfile
+видит только поток, в котором включен: под ASGI это поток цикла
+событий, поэтому синхронные view и db_call, работающие в потоках
+sync_to_async, в профиль не попадают, а работа других запросов в цикле
+событий — попадает.
+"""
+import io
+import pstats
+import random
+import time
+import uuid
+from pathlib import Path
+
+from django.conf import settings
+from django.urls import Resolver404, resolve
+from rest_framework.exceptions import APIException
+
+from .authentication import CachedTokenAuthentication
+from .models import RequestProfile
+from .permissions import is_admin
+
+TRIGGER_HEADER = 'HTTP_X_PROFILE'
+TRIGGER_PARAM = 'profile'
+STATS_LIMIT = 60
+
+authentication = CachedTokenAuthentication()
+
+
+def profile_requested(request):
+    """Передан ли заголовок или параметр профилирования; проверка без
+    обращения к базе."""
+    return '1' in (request.META.get(TRIGGER_HEADER),
+                   request.GET.get(TRIGGER_PARAM))
+
+
+def requested_by(request):
+    """Администратор, запросивший профиль, или None."""
+    if not profile_requested(request):
+        return None
+    user = getattr(request, 'user', None)
+    if not is_admin(user):
+        try:
+            credentials = authentication.authenticate(request)
+        except APIException:
+            return None
+        user = credentials and credentials[0]
+    return user if is_admin(user) else None
+
+
+def sampled(request):
+    if random.random() >= settings.PROFILE_SAMPLE_RATE:
+        return False
+    try:
+        return resolve(request.path_info).view_name in settings.PROFILE_ROUTES
+    except Resolver404:
+        return False
+
+
+def profile_path(profile):
+    return Path(settings.PROFILE_DIR) / profile.file
+
+
+def save_profile(profiler, request, response, duration, user):
+    directory = Path(settings.PROFILE_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    name = f'{time.strftime("%Y%m%d-%H%M%S")}-{uuid.uuid4().hex[:8]}.prof'
+    profiler.dump_stats(str(directory / name))
+    match = request.resolver_match
+    profile = RequestProfile.objects.create(
+        method=request.method,
+        path=request.get_full_path()[:2000],
+        view=match.view_name if match else '',
+        status=response.status_code,
+        duration=duration,
+        sampled=user is None,
+        user=user,
+        file=name,
+    )
+    trim_profiles()
+    return profile
+
+
+def trim_profiles():
+    """Удаляет профили сверх PROFILE_KEEP одним DELETE; файлы удаляет
+    сигнал post_delete после удаления записей."""
+    stale = list(RequestProfile.objects.values_list(
+        'id', flat=True)[settings.PROFILE_KEEP:])
+    if stale:
+        RequestProfile.objects.filter(id__in=stale).delete()
+
+
+def stats_text(profile):
+    """Самые долгие функции по накопленному времени."""
+    stream = io.StringIO()
+    pstats.Stats(str(profile_path(profile)), stream=stream).sort_stats(
+        'cumulative').print_stats(STATS_LIMIT)
+    return stream.getvalue()
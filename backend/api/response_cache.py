@@ -0,0 +1,112 @@
+"""Кэш готовых ответов API для анонимных пользователей.
+
+Ключ ответа — схема, хост и путь, нормализованные параметры фильтров
+и пагинации, формат ответа и поколения данных (recipes.versions). Поколения
+хранятся в том же кэше: при изменении рецепта, его ингредиентов, тегов
+или автора сигналы удаляют поколение, и старые ответы перестают
+находиться, пока не истекут или не будут вытеснены. Счетчики
+попаданий и промахов общие для всех процессов, работающих с кэшем.
+Сбросы видны всем процессам только в общем кэше; в локальном ответы и
+поколения хранятся не дольше LOCAL_CACHE_TIMEOUT (см. app.caches).
+"""
+import hashlib
+from functools import wraps
+
+from django.core.cache import caches
+from django.http import HttpResponse
+
+from app.caches import lifetime
+from recipes.versions import (ALL, INGREDIENTS, LISTS, RESPONSES, TAGS,
+                              catalog_version, generations,
+                              recipe_generation)
+from .db_router import primary
+
+CACHE_ALIAS = RESPONSES
+PAGINATION_PARAMS = ('page', 'limit', 'cursor', 'count')
+STATS = ('hits', 'misses')
+CACHED_HEADERS = ('Content-Type', 'Vary', 'Allow')
+
+
+def response_cache():
+    return caches[CACHE_ALIAS]
+
+
+def count(name):
+    cache = response_cache()
+    key = f'stats:{name}'
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, timeout=None):
+            cache.incr(key)
+
+
+def stats():
+    cache = response_cache()
+    values = cache.get_many([f'stats:{name}' for name in STATS])
+    result = {name: values.get(f'stats:{name}', 0) for name in STATS}
+    total = result['hits'] + result['misses']
+    result['hit_ratio'] = round(result['hits'] / total, 4) if total else None
+    evictions = getattr(cache, 'evictions', None)
+    result['evictions'] = evictions() if evictions else None
+    result['backend'] = f'{type(cache).__module__}.{type(cache).__name__}'
+    return result
+
+
+def normalized_params(request):
+    """Параметры, влияющие на ответ, в каноническом порядке; прочие
+    параметры (метки рекламы и т.п.) не дробят кэш."""
+    view = request.parser_context['view']
+    known = set(getattr(view.filterset_class, 'base_filters', ()))
+    known.update(PAGINATION_PARAMS)
+    params = request.query_params
+    return [(name, sorted(params.getlist(name)))
+            for name in sorted(params) if name in known]
+
+
+def response_key(request, recipe_id=None):
+    scope = LISTS if recipe_id is None else recipe_generation(recipe_id)
+    # Ответы содержат абсолютные ссылки на картинки: ответ на запрос с
+    # чужим Host не должен попасть к другим клиентам.
+    parts = [request.scheme, request.get_host(), request.path,
+             normalized_params(request),
+             request.accepted_renderer.format, *generations(ALL, scope),
+             catalog_version(TAGS), catalog_version(INGREDIENTS)]
+    digest = hashlib.md5(repr(parts).encode()).hexdigest()
+    return f'response:{digest}'
+
+
+def cache_anonymous(view_func):
+    """Готовый ответ из кэша для анонима; успешный ответ сохраняется
+    после отрисовки. При промахе ответ читается с основной базы, чтобы
+    не сохранить под новым поколением данные отстающей реплики."""
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        if request.user.is_authenticated:
+            return view_func(request, *args, **kwargs)
+        cache = response_cache()
+        key = response_key(request, kwargs.get('pk'))
+        cached = cache.get(key)
+        if cached is not None:
+            count('hits')
+            content, headers = cached
+            response = HttpResponse(content)
+            for name, value in headers.items():
+                response[name] = value
+            return response
+        count('misses')
+        with primary():
+            response = view_func(request, *args, **kwargs)
+        if response.status_code == 200:
+            timeout = lifetime(cache.default_timeout, CACHE_ALIAS)
+
+            def store(rendered):
+                # Значение, возвращенное обратным вызовом, заменило бы
+                # ответ, а set у django-redis возвращает True.
+                headers = {name: rendered[name] for name in CACHED_HEADERS
+                           if rendered.has_header(name)}
+                cache.set(key, (rendered.content, headers), timeout)
+
+            response.add_post_render_callback(store)
+        return response
+    return wrapper
@@ -1,6 +1,7 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core import validators
-from django.db.models import F
+from django.db import models, transaction
 from djoser.serializers import UserCreateSerializer, UserSerializer
 from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers, status
@@ -11,6 +12,8 @@ from rest_framework.validators import UniqueValidator
 
 from recipes.models import Ingredient, IngredientInRecipe, Recipe, Tag
 from users.models import Subscribe
+from .loaders import user_state
+from .metrics import TimedListSerializer, TimedSerializerMixin
 from .utils import clean_unique
 
 User = get_user_model()
@@ -23,28 +26,42 @@ class CustomUserCreateSerializer(UserCreateSerializer):
         model = User
 
 
-class CustomUserSerializer(UserSerializer):
+class UserStateListSerializer(TimedListSerializer):
+    """Загружает состояние пользователя сразу для всех объектов списка."""
+
+    def to_representation(self, data):
+        iterable = data.all() if isinstance(data, models.Manager) else data
+        items = list(iterable)
+        self.child.load_user_state(
+            user_state(self.context.get('request')), items)
+        return super().to_representation(items)
+
+
+class CustomUserSerializer(TimedSerializerMixin, UserSerializer):
     is_subscribed = serializers.SerializerMethodField(read_only=True)
 
     class Meta:
         fields = ('email', 'id', 'username', 'first_name', 'last_name',
                   'is_subscribed')
         model = User
+        list_serializer_class = UserStateListSerializer
+
+    def load_user_state(self, state, users):
+        state.load(author_ids=[user.id for user in users])
 
     def get_is_subscribed(self, obj):
-        user = self.context.get('request').user
-        if user.is_anonymous:
-            return False
-        return Subscribe.objects.filter(user=user, author=obj).exists()
+        return user_state(self.context.get('request')).is_subscribed(obj.id)
 
 
-class IngredientSerializer(serializers.ModelSerializer):
+class IngredientSerializer(TimedSerializerMixin,
+                           serializers.ModelSerializer):
     class Meta:
         model = Ingredient
         fields = ('id', 'name', 'measurement_unit')
+        list_serializer_class = TimedListSerializer
 
 
-class TagSerializer(serializers.ModelSerializer):
+class TagSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     name = serializers.CharField(max_length=200)
     slug = serializers.CharField(
         max_length=50,
@@ -58,9 +75,10 @@ class TagSerializer(serializers.ModelSerializer):
         model = Tag
         fields = ('id', 'name', 'color', 'slug')
         lookup_field = 'slug'
+        list_serializer_class = TimedListSerializer
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class RecipeSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     image = Base64ImageField()
 
     class Meta:
@@ -76,7 +94,8 @@ class IngredientInRecipeSerializer(serializers.ModelSerializer):
         fields = ('id', 'amount')
 
 
-class RecipeSerializerRead(serializers.ModelSerializer):
+class RecipeSerializerRead(TimedSerializerMixin,
+                           serializers.ModelSerializer):
     image = Base64ImageField()
     author = CustomUserSerializer(read_only=True)
     ingredients = serializers.SerializerMethodField()
@@ -88,33 +107,38 @@ class RecipeSerializerRead(serializers.ModelSerializer):
         model = Recipe
         fields = ('id', 'tags', 'author', 'ingredients', 'is_favorited',
                   'is_in_shopping_cart', 'name', 'image', 'text',
-                  'cooking_time',)
+                  'cooking_time', 'favorites_count',)
+        read_only_fields = ('favorites_count',)
+        list_serializer_class = UserStateListSerializer
+
+    def load_user_state(self, state, recipes):
+        state.load(recipe_ids=[recipe.id for recipe in recipes],
+                   author_ids=[recipe.author_id for recipe in recipes])
 
     def get_ingredients(self, obj):
         """Получение списка ингредиентов."""
-        ingredients = obj.ingredients.values(
-            'id',
-            'name',
-            'measurement_unit',
-            amount=F('ingredientinrecipe__amount'))
-        return ingredients
+        return [
+            {
+                'id': item.ingredient.id,
+                'name': item.ingredient.name,
+                'measurement_unit': item.ingredient.measurement_unit,
+                'amount': item.amount,
+            }
+            for item in obj.ingredient_list.all()
+        ]
 
     def get_is_in_shopping_cart(self, obj):
         """Находится ли в списке покупок."""
-        user = self.context.get('request').user
-        if user.is_anonymous:
-            return False
-        return user.shopping_list.filter(recipe=obj).exists()
+        return user_state(
+            self.context.get('request')).is_in_shopping_cart(obj.id)
 
     def get_is_favorited(self, obj):
         """Находится ли в избранном."""
-        user = self.context.get('request').user
-        if user.is_anonymous:
-            return False
-        return user.favorites.filter(recipe=obj).exists()
+        return user_state(self.context.get('request')).is_favorited(obj.id)
 
 
-class RecipeSerializerWrite(serializers.ModelSerializer):
+class RecipeSerializerWrite(TimedSerializerMixin,
+                            serializers.ModelSerializer):
     author = CustomUserSerializer(read_only=True)
     image = Base64ImageField()
     ingredients = IngredientInRecipeSerializer(many=True, required=True)
@@ -131,12 +155,17 @@ class RecipeSerializerWrite(serializers.ModelSerializer):
         ingredient_list = []
         massage = 'Не должно быть повторяющихся ингредиентов'
         for ingredient in ingredients:
-            print(ingredient)
             if int(ingredient['amount']) <= 0:
                 raise ValidationError('Выберите кол-во для ингредиента')
             if ingredient['id'] in ingredient_list:
                 raise ValidationError([{"ingredient": [massage]}, {}])
             ingredient_list.append(ingredient['id'])
+        missing = set(ingredient_list) - set(
+            Ingredient.objects.in_bulk(ingredient_list))
+        if missing:
+            raise ValidationError(
+                f'Ингредиенты не найдены: '
+                f'{", ".join(map(str, sorted(missing)))}')
         return ingredients
 
     def to_representation(self, instance):
@@ -148,10 +177,35 @@ class RecipeSerializerWrite(serializers.ModelSerializer):
         IngredientInRecipe.objects.bulk_create(
             [IngredientInRecipe(
                 recipe=recipe,
-                ingredient=Ingredient.objects.get(pk=ingredient['id']),
+                ingredient_id=ingredient['id'],
                 amount=ingredient['amount']
             ) for ingredient in ingredients])
 
+    def update_ingredients(self, recipe, ingredients):
+        """Изменение только добавленных, удаленных и измененных
+        ингредиентов рецепта."""
+        amounts = {ingredient['id']: ingredient['amount']
+                   for ingredient in ingredients}
+        current = {item.ingredient_id: item
+                   for item in IngredientInRecipe.objects.filter(
+                       recipe=recipe)}
+        removed = current.keys() - amounts.keys()
+        if removed:
+            IngredientInRecipe.objects.filter(
+                recipe=recipe, ingredient_id__in=removed).delete()
+        changed = []
+        for ingredient_id, item in current.items():
+            amount = amounts.get(ingredient_id)
+            if amount is not None and item.amount != amount:
+                item.amount = amount
+                changed.append(item)
+        if changed:
+            IngredientInRecipe.objects.bulk_update(changed, ['amount'])
+        self.create_ingredients(recipe=recipe, ingredients=[
+            ingredient for ingredient in ingredients
+            if ingredient['id'] not in current])
+
+    @transaction.atomic
     def create(self, validated_data):
         request = self.context.get('request')
         tags = validated_data.pop('tags')
@@ -162,20 +216,21 @@ class RecipeSerializerWrite(serializers.ModelSerializer):
         self.create_ingredients(recipe=recipe, ingredients=ingredients)
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
-        tags = validated_data.pop('tags')
-        ingredients = validated_data.pop('ingredients')
+        tags = validated_data.pop('tags', None)
+        ingredients = validated_data.pop('ingredients', None)
         instance = super().update(instance, validated_data)
-        instance.tags.clear()
-        instance.tags.set(tags)
-        instance.ingredients.clear()
-        self.create_ingredients(recipe=instance, ingredients=ingredients)
+        if tags is not None:
+            instance.tags.set(tags)
+        if ingredients is not None:
+            self.update_ingredients(recipe=instance, ingredients=ingredients)
         return instance
 
 
 class SubscribeSerializer(CustomUserSerializer):
     recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.SerializerMethodField()
+    recipes_count = serializers.IntegerField(read_only=True)
 
     class Meta(CustomUserSerializer.Meta):
         fields = ('email', 'id', 'username', 'first_name', 'last_name',
@@ -184,18 +239,17 @@ class SubscribeSerializer(CustomUserSerializer):
 
     def get_recipes(self, obj):
         """Получение рецептов."""
-        request = self.context.get('request')
-        limit = request.GET.get('recipes_limit')
-        recipes = Recipe.objects.filter(author=obj)
-        if limit:
-            recipes = recipes[: int(limit)]
+        if hasattr(obj, 'latest_recipes'):
+            recipes = obj.latest_recipes
+        else:
+            request = self.context.get('request')
+            limit = request.GET.get('recipes_limit')
+            recipes = Recipe.objects.filter(author=obj)
+            if limit:
+                recipes = recipes[: int(limit)]
         serializer = RecipeSerializer(recipes, many=True, read_only=True)
         return serializer.data
 
-    def get_recipes_count(self, obj):
-        """Подсчет рецептов у автора."""
-        return Recipe.objects.filter(author=obj).count()
-
     def validate(self, data):
         """Проверка на подписки."""
         author = self.instance
@@ -211,3 +265,12 @@ class SubscribeSerializer(CustomUserSerializer):
                 code=status.HTTP_400_BAD_REQUEST,
             )
         return data
+
+
+class RecipeIdsSerializer(serializers.Serializer):
+    """Список id рецептов для пакетного добавления и удаления."""
+    recipes = serializers.ListField(
+        child=IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.BATCH_RECIPES_LIMIT,
+    )
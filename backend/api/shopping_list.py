@@ -0,0 +1,45 @@
+"""PDF со списком покупок.
+
+reportlab импортируется при первом обращении, а не при загрузке
+views: большинству запросов он не нужен. Шрифт регистрируется один
+раз на процесс.
+"""
+import os
+
+from django.conf import settings
+
+FONT = 'FreeSans'
+FONT_PATH = os.path.join(settings.BASE_DIR, 'static', 'FreeSans.ttf')
+FONT_SIZE = 16
+TOP = 800
+LINE_HEIGHT = 30
+LINES_PER_PAGE = 26
+
+
+def load_font():
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont
+    if FONT not in pdfmetrics.getRegisteredFontNames():
+        pdfmetrics.registerFont(TTFont(FONT, FONT_PATH))
+
+
+def render_pdf(output, ingredients):
+    """Пишет в output PDF со строками «название (единица) - количество»."""
+    from reportlab.pdfgen import canvas
+    load_font()
+    pdf = canvas.Canvas(output)
+    pdf.setFont(FONT, FONT_SIZE)
+    y = TOP
+    pdf.drawString(100, y, 'Список покупок : ')
+    for number, ingredient in enumerate(ingredients, 1):
+        y -= LINE_HEIGHT
+        if number % LINES_PER_PAGE == 0:
+            y = TOP
+            pdf.showPage()
+            pdf.setFont(FONT, FONT_SIZE)
+        pdf.drawString(100, y, (
+            f'* {ingredient["ingredient__name"]} '
+            f'({ingredient["ingredient__measurement_unit"]})'
+            f' - {ingredient["total_amount"]}'))
+    pdf.showPage()
+    pdf.save()
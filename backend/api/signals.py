@@ -0,0 +1,125 @@
+from django.contrib.auth import get_user_model, user_logged_out
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from recipes.models import (Favorite, Ingredient, IngredientInRecipe, Recipe,
+                            Tag, TagInRecipe)
+from recipes.versions import (INGREDIENTS, TAGS, bump_catalog_version,
+                              drop_timeline, invalidate_all,
+                              invalidate_recipes)
+from users.models import Subscribe
+from .authentication import bump_auth_version, token_cache
+from .feed import push_recipe
+from .models import RequestProfile
+from .profiling import profile_path
+
+User = get_user_model()
+AUTHOR_FIELDS = {'email', 'username', 'first_name', 'last_name'}
+SESSION_FIELDS = {'last_login'}
+
+
+@receiver([post_save, post_delete], sender=Ingredient)
+def ingredients_changed(sender, **kwargs):
+    """Новая версия справочника ингредиентов."""
+    bump_catalog_version(INGREDIENTS)
+
+
+@receiver([post_save, post_delete], sender=Tag)
+def tags_changed(sender, **kwargs):
+    """Новая версия справочника тегов."""
+    bump_catalog_version(TAGS)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_published(sender, instance, created, **kwargs):
+    """Новый рецепт попадает в ленты подписчиков после коммита."""
+    if created:
+        transaction.on_commit(
+            lambda: push_recipe(instance.id, instance.author_id))
+
+
+@receiver([post_save, post_delete], sender=Subscribe)
+def subscriptions_changed(sender, instance, **kwargs):
+    drop_timeline(instance.user_id)
+
+
+def invalidate_on_commit(recipe_ids, lists=True):
+    """Сброс кэша ответов после коммита: до него другие запросы
+    еще видят старые данные и сохранили бы их под новым поколением."""
+    recipe_ids = list(recipe_ids)
+    transaction.on_commit(lambda: invalidate_recipes(recipe_ids, lists))
+
+
+@receiver([post_save, post_delete], sender=Recipe)
+def recipe_changed(sender, instance, **kwargs):
+    invalidate_on_commit([instance.id])
+
+
+@receiver([post_save, post_delete], sender=IngredientInRecipe)
+@receiver([post_save, post_delete], sender=TagInRecipe)
+def recipe_rows_changed(sender, instance, **kwargs):
+    invalidate_on_commit([instance.recipe_id])
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipe_tags_changed(sender, instance, action, reverse, pk_set,
+                        **kwargs):
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        invalidate_on_commit([instance.id])
+    elif pk_set:
+        invalidate_on_commit(pk_set)
+    else:
+        transaction.on_commit(invalidate_all)
+
+
+@receiver([post_save, post_delete], sender=Favorite)
+def favorites_changed(sender, instance, **kwargs):
+    """Счетчик избранного есть только в ответе рецепта, списки
+    обновятся по истечении их срока."""
+    invalidate_on_commit([instance.recipe_id], lists=False)
+
+
+@receiver(post_save, sender=User)
+def author_changed(sender, instance, created, update_fields, **kwargs):
+    if created or (update_fields is not None
+                   and not AUTHOR_FIELDS & set(update_fields)):
+        return
+    recipe_ids = Recipe.objects.filter(author=instance).values_list(
+        'id', flat=True)
+    if recipe_ids:
+        invalidate_on_commit(recipe_ids)
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance, **kwargs):
+    token_cache.discard(instance.key)
+    bump_auth_version(instance.user_id)
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, update_fields, **kwargs):
+    """Пароль, роль и прочие поля пользователя могли измениться:
+    кэшированные токены пользователя больше недействительны."""
+    if created or (update_fields is not None
+                   and set(update_fields) <= SESSION_FIELDS):
+        return
+    bump_auth_version(instance.pk)
+
+
+@receiver(user_logged_out)
+def user_logged_out_everywhere(sender, user, **kwargs):
+    if user is not None:
+        bump_auth_version(user.pk)
+
+
+@receiver(post_delete, sender=RequestProfile)
+def profile_deleted(sender, instance, **kwargs):
+    """Файл профиля удаляется вместе с записью."""
+    try:
+        profile_path(instance).unlink()
+    except FileNotFoundError:
+        pass
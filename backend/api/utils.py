@@ -1,3 +1,38 @@
+import math
+
+from django.db.models import F, Window
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import RowNumber
+
+from recipes.models import Recipe
+
+
 def clean_unique(ingredients):
     """Валидатор, оставляющий только уникальные значения."""
     return list(set(ingredients))
+
+
+def percentile(latencies, share):
+    """Перцентиль по отсортированному списку (метод ближайшего ранга)."""
+    if not latencies:
+        return 0.0
+    return latencies[max(math.ceil(len(latencies) * share / 100) - 1, 0)]
+
+
+def latest_recipes(authors, limit=None):
+    """Последние limit рецептов каждого автора одним запросом
+    (ROW_NUMBER с разбиением по автору)."""
+    recipes = Recipe.objects.filter(author__in=authors)
+    if not limit:
+        return recipes
+    ranked = recipes.annotate(recipe_rank=Window(
+        expression=RowNumber(),
+        partition_by=[F('author_id')],
+        order_by=F('id').desc(),
+    )).values('id', 'recipe_rank')
+    sql, params = ranked.query.sql_with_params()
+    return Recipe.objects.filter(id__in=RawSQL(
+        f'SELECT ranked.id FROM ({sql}) ranked '
+        f'WHERE ranked.recipe_rank <= %s',
+        (*params, int(limit)),
+    ))
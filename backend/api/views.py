@@ -1,27 +1,39 @@
+import ipaddress
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db.models import Sum
-from django.http import HttpResponse
-from django.shortcuts import get_object_or_404
+from django.db.models import Prefetch, Sum, prefetch_related_objects
+from django.http import (HttpResponse, HttpResponseForbidden, JsonResponse,
+                         StreamingHttpResponse)
+from django.utils.crypto import constant_time_compare
+from django.utils.decorators import method_decorator
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-from reportlab.pdfgen import canvas
-from rest_framework import filters, status, viewsets
-from rest_framework.decorators import action
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework import filters, viewsets
+from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 
 from recipes.models import (Favorite, Ingredient, IngredientInRecipe, Recipe,
                             ShoppingList, Tag)
-from users.models import Subscribe
+from recipes.ndjson import export_lines
+from recipes.versions import INGREDIENTS, TAGS
+from . import actions
+from .catalog import ingredient_index
+from .conditional import catalog_cache, recipe_cache
+from .feed import get_timeline
+from .metrics import registry
 from .filters import RecipeFilter
-from .permissions import IsAdminOrReadOnly, IsAuthorOrReadOnly
+from .permissions import IsAdmin, IsAdminOrReadOnly, IsAuthorOrReadOnly
 from .serializers import (CustomUserSerializer, IngredientSerializer,
-                          RecipeSerializer, RecipeSerializerRead,
+                          RecipeIdsSerializer, RecipeSerializerRead,
                           RecipeSerializerWrite, SubscribeSerializer,
                           TagSerializer)
 from .pagination import CustomPagination
+from .response_cache import cache_anonymous, stats
+from .shopping_list import render_pdf
+from .warmup import readiness, startup
+from .utils import latest_recipes
 
 User = get_user_model()
 
@@ -38,21 +50,12 @@ class UserViewSet(UserViewSet):
             permission_classes=(IsAuthenticated,))
     def subscribe(self, request, **kwargs):
         """Подписываемся и отписываемся от автора."""
-        user = request.user
         author_id = self.kwargs.get('id')
-        author = get_object_or_404(User, id=author_id)
-
         if request.method == 'POST':
-            serializer = SubscribeSerializer(author,
-                                             data=request.data,
-                                             context={"request": request})
-            serializer.is_valid(raise_exception=True)
-            Subscribe.objects.create(user=user, author=author)
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
-
-        subscription = get_object_or_404(Subscribe, user=user, author=author)
-        subscription.delete()
-        return Response(status=status.HTTP_204_NO_CONTENT)
+            data, code = actions.subscribe(request, author_id, request.data)
+        else:
+            data, code = actions.unsubscribe(request.user, author_id)
+        return Response(data, status=code)
 
     @action(detail=False, permission_classes=[IsAuthenticated])
     def subscriptions(self, request):
@@ -60,21 +63,37 @@ class UserViewSet(UserViewSet):
         user = request.user
         queryset = User.objects.filter(subscribing__user=user)
         pages = self.paginate_queryset(queryset)
+        prefetch_related_objects(pages, Prefetch(
+            'recipes',
+            queryset=latest_recipes(pages,
+                                    request.GET.get('recipes_limit')),
+            to_attr='latest_recipes',
+        ))
         serializer = SubscribeSerializer(
             pages, many=True, context={
                 'request': request})
         return self.get_paginated_response(serializer.data)
 
 
+@method_decorator(catalog_cache(INGREDIENTS), name='list')
+@method_decorator(catalog_cache(INGREDIENTS), name='retrieve')
 class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Ingredient.objects.all()
     permission_classes = (IsAdminOrReadOnly,)
     serializer_class = IngredientSerializer
-    filter_backends = (filters.SearchFilter,)
-    search_fields = ('^name',)
     pagination_class = None
 
+    def list(self, request, *args, **kwargs):
+        """Автодополнение по названию из индекса в памяти."""
+        return Response(ingredient_index.search(
+            request.query_params.get('name', ''),
+            settings.INGREDIENTS_SEARCH_LIMIT,
+        ))
+
 
+@method_decorator(recipe_cache, name='retrieve')
+@method_decorator(cache_anonymous, name='retrieve')
+@method_decorator(cache_anonymous, name='list')
 class RecipeViewSet(viewsets.ModelViewSet):
     permission_classes = (IsAuthorOrReadOnly | IsAdminOrReadOnly,)
     queryset = Recipe.objects.all()
@@ -88,8 +107,14 @@ class RecipeViewSet(viewsets.ModelViewSet):
         return RecipeSerializerWrite
 
     def get_queryset(self):
-        queryset = Recipe.objects.all()
-        return queryset
+        """Рецепты с автором, тегами и ингредиентами за фиксированное
+        число запросов; флаги пользователя загружает UserState."""
+        return Recipe.objects.select_related('author').prefetch_related(
+            'tags',
+            Prefetch('ingredient_list',
+                     queryset=IngredientInRecipe.objects.select_related(
+                         'ingredient')),
+        )
 
     @action(detail=True, methods=['post', 'delete'],
             permission_classes=[IsAuthenticated])
@@ -107,22 +132,56 @@ class RecipeViewSet(viewsets.ModelViewSet):
             return self.add_recipe(ShoppingList, request.user, pk)
         return self.delete_recipe(ShoppingList, request.user, pk)
 
+    @action(detail=False, methods=['post', 'delete'], url_path='favorite',
+            permission_classes=[IsAuthenticated])
+    def favorite_batch(self, request):
+        """Пакетное добавление и удаление из избранного."""
+        return self.change_recipes(Favorite, request)
+
+    @action(detail=False, methods=['post', 'delete'],
+            url_path='shopping_cart', permission_classes=[IsAuthenticated])
+    def shopping_cart_batch(self, request):
+        """Пакетное добавление и удаление из списка покупок."""
+        return self.change_recipes(ShoppingList, request)
+
+    def change_recipes(self, model, request):
+        serializer = RecipeIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data['recipes']
+        if request.method == 'POST':
+            data, code = actions.add_recipes(model, request.user, ids)
+        else:
+            data, code = actions.delete_recipes(model, request.user, ids)
+        return Response(data, status=code)
+
     def add_recipe(self, model, user, pk):
-        if model.objects.filter(user=user, recipe__id=pk).exists():
-            return Response({'errors': 'Рецепт уже добавлен!'},
-                            status=status.HTTP_400_BAD_REQUEST)
-        recipe = get_object_or_404(Recipe, id=pk)
-        model.objects.create(user=user, recipe=recipe)
-        serializer = RecipeSerializer(recipe)
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
+        data, code = actions.add_recipe(model, user, pk)
+        return Response(data, status=code)
 
     def delete_recipe(self, model, user, pk):
-        recipe_del = model.objects.filter(user=user, recipe__id=pk)
-        if recipe_del.exists():
-            recipe_del.delete()
-            return Response(status=status.HTTP_204_NO_CONTENT)
-        return Response({'errors': 'Рецепт уже удален!'},
-                        status=status.HTTP_400_BAD_REQUEST)
+        data, code = actions.delete_recipe(model, user, pk)
+        return Response(data, status=code)
+
+    @action(detail=False, permission_classes=[IsAuthenticated])
+    def feed(self, request):
+        """Рецепты авторов из подписок, новые первыми."""
+        queryset = self.filter_queryset(self.get_queryset()).filter(
+            id__in=get_timeline(request.user.id))
+        page = self.paginate_queryset(queryset)
+        serializer = RecipeSerializerRead(page, many=True,
+                                          context={'request': request})
+        return self.get_paginated_response(serializer.data)
+
+    @action(detail=False, permission_classes=[IsAdmin])
+    def export(self, request):
+        """Потоковая выгрузка рецептов в NDJSON с учетом фильтров."""
+        queryset = self.filter_queryset(Recipe.objects.order_by('id'))
+        response = StreamingHttpResponse(
+            export_lines(queryset, settings.EXPORT_CHUNK_SIZE),
+            content_type='application/x-ndjson')
+        response['Content-Disposition'] = (
+            'attachment; filename="recipes.ndjson"')
+        return response
 
     @action(
         detail=False,
@@ -136,37 +195,63 @@ class RecipeViewSet(viewsets.ModelViewSet):
             'ingredient__name',
             'ingredient__measurement_unit'
         ).annotate(total_amount=Sum('amount'))
-        y = 800
         filename = f'{user.username}_shopping_list.pdf'
         response = HttpResponse(content_type='application/pdf')
         response['Content-Disposition'] = f'attachment; filename="{filename}"'
-        p = canvas.Canvas(response)
-        pdfmetrics.registerFont(TTFont('FreeSans',
-                                       'static/FreeSans.ttf'))
-        p.setFont('FreeSans', 16)
-        p.drawString(100, y, 'Список покупок : ')
-        shopping_list = ''
-        kol_str = 0
-        print(type(ingredients))
-        for ingredient in ingredients:
-            y -= 30
-            shopping_list = (f'* {ingredient["ingredient__name"]} '
-                             f'({ingredient["ingredient__measurement_unit"]})'
-                             f' - {ingredient["total_amount"]}')
-            kol_str += 1
-            if kol_str % 26 == 0:
-                y = 800
-                p.showPage()
-                p.setFont('FreeSans', 16)
-            p.drawString(100, y, shopping_list)
-        p.showPage()
-        p.save()
-
+        render_pdf(response, ingredients)
         return response
 
 
+@method_decorator(catalog_cache(TAGS), name='list')
+@method_decorator(catalog_cache(TAGS), name='retrieve')
 class TagViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Tag.objects.all()
     permission_classes = (IsAdminOrReadOnly,)
     serializer_class = TagSerializer
     pagination_class = None
+
+
+@api_view(['GET'])
+@permission_classes([IsAdmin])
+def response_cache_stats(request):
+    """Попадания, промахи и вытеснения кэша ответов."""
+    return Response(stats())
+
+
+def metrics_allowed(request):
+    """Адрес из METRICS_ALLOWED_NETWORKS без прокси перед ним и, если
+    задан METRICS_TOKEN, заголовок Authorization: Bearer <токен>."""
+    if 'HTTP_X_REAL_IP' in request.META:
+        return False
+    try:
+        address = ipaddress.ip_address(request.META.get('REMOTE_ADDR', ''))
+    except ValueError:
+        return False
+    if not any(address in ipaddress.ip_network(network)
+               for network in settings.METRICS_ALLOWED_NETWORKS):
+        return False
+    if not settings.METRICS_TOKEN:
+        return True
+    return constant_time_compare(
+        request.META.get('HTTP_AUTHORIZATION', ''),
+        f'Bearer {settings.METRICS_TOKEN}')
+
+
+def metrics(request):
+    """Метрики процесса в формате Prometheus для опроса внутри сети
+    контейнеров; остальным — 403."""
+    if not metrics_allowed(request):
+        return HttpResponseForbidden()
+    return HttpResponse(registry.exposition(),
+                        content_type='text/plain; version=0.0.4')
+
+
+def ready(request):
+    """Проверка готовности для балансировщика: 503, пока процесс не
+    прогрет или база недоступна; в ответе время этапов запуска."""
+    is_ready = readiness()
+    return JsonResponse(
+        {'ready': is_ready,
+         'startup': {name: round(seconds, 3)
+                     for name, seconds in startup.items()}},
+        status=200 if is_ready else 503)
@@ -0,0 +1,86 @@
+"""Прогрев процесса перед приемом запросов и проверка готовности.
+
+После загрузки Django (app/wsgi.py, app/asgi.py) импортируется URLconf
+со всеми view, справочники тегов и ингредиентов загружаются в память,
+шрифт списка покупок — в reportlab. С preload_app (gunicorn.conf.py)
+это выполняется один раз в мастер-процессе, и рабочие процессы
+получают готовые данные при fork. Если база при старте недоступна,
+прогрев повторяется при проверке готовности.
+"""
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.exceptions import SynchronousOnlyOperation
+from django.db import DatabaseError, connection, connections
+from django.urls import get_resolver
+
+from .catalog import ingredient_index, tag_map
+from .shopping_list import load_font
+
+logger = logging.getLogger(__name__)
+
+startup = {}
+state = {'ready': False}
+lock = threading.Lock()
+
+
+def load_urls():
+    get_resolver().url_patterns
+
+
+def load_catalogs():
+    tag_map.ids()
+    ingredient_index.all()
+
+
+STEPS = (
+    ('urls', load_urls),
+    ('catalogs', load_catalogs),
+    ('pdf', load_font),
+)
+
+
+def warm_up():
+    """Шаги прогрева с замером времени; соединения с базой после
+    прогрева закрываются, чтобы не достаться процессам после fork."""
+    with lock:
+        if state['ready']:
+            return True
+        try:
+            for name, step in STEPS:
+                started = time.perf_counter()
+                step()
+                startup[name] = time.perf_counter() - started
+        except (DatabaseError, SynchronousOnlyOperation) as error:
+            logger.warning('Прогрев не выполнен: %s', error)
+            return False
+        finally:
+            connections.close_all()
+        state['ready'] = True
+        return True
+
+
+def start(django_seconds):
+    """Вызывается после загрузки приложения."""
+    startup['django'] = django_seconds
+    if not settings.WARM_UP:
+        state['ready'] = True
+    elif not warm_up():
+        return
+    logger.info('Процесс готов за %.2f с (%s)', sum(startup.values()),
+                ', '.join(f'{name} {seconds:.2f} с'
+                          for name, seconds in startup.items()))
+
+
+def readiness():
+    """Прогрев выполнен и основная база отвечает."""
+    if not warm_up():
+        return False
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+    except DatabaseError:
+        return False
+    return True
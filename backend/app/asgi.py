@@ -0,0 +1,14 @@
+import os
+import time
+
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "app.settings")
+os.environ.setdefault("ASYNC_VIEWS", "True")
+
+started = time.perf_counter()
+application = get_asgi_application()
+
+from api.warmup import start  # noqa: E402
+
+start(time.perf_counter() - started)
@@ -0,0 +1,55 @@
+"""Кэши, общие для процессов.
+
+Отзыв токенов, версии справочников, ленты, закрепление клиентов за
+основной базой и кэш ответов хранятся в кэшах Django, и сбросы должны
+доходить до всех рабочих процессов и команд управления. Локальный кэш
+(locmem) годится только для одного процесса: gunicorn с несколькими
+рабочими процессами с ним не запускается, а долгоживущие записи в нем
+хранятся не дольше LOCAL_CACHE_TIMEOUT, чтобы изменения, сделанные
+командами управления, доходили до сервера хотя бы с задержкой.
+"""
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.utils.module_loading import import_string
+
+LOCAL_BACKENDS = (LocMemCache, DummyCache)
+
+
+@lru_cache(maxsize=None)
+def is_local_backend(backend):
+    return issubclass(import_string(backend), LOCAL_BACKENDS)
+
+
+def local_caches():
+    """Псевдонимы кэшей, содержимое которых видно только своему
+    процессу."""
+    return [alias for alias, params in settings.CACHES.items()
+            if is_local_backend(params['BACKEND'])]
+
+
+def is_shared(alias='default'):
+    return not is_local_backend(settings.CACHES[alias]['BACKEND'])
+
+
+def lifetime(timeout, alias='default'):
+    """Срок хранения записи, которую сбрасывают другие процессы: в
+    локальном кэше — не дольше LOCAL_CACHE_TIMEOUT."""
+    if is_shared(alias):
+        return timeout
+    if timeout is None:
+        return settings.LOCAL_CACHE_TIMEOUT
+    return min(timeout, settings.LOCAL_CACHE_TIMEOUT)
+
+
+def delay_notice():
+    """Предупреждение для команд управления: с локальными кэшами
+    запущенный сервер узнает об их изменениях только с задержкой."""
+    local = local_caches()
+    if not local:
+        return None
+    return (f'Кэши {", ".join(local)} локальны для процесса: запущенный '
+            f'сервер увидит изменения в течение '
+            f'{settings.LOCAL_CACHE_TIMEOUT} с')
@@ -14,6 +14,12 @@ DEBUG = True
 
 ALLOWED_HOSTS = ['*']
 
+ASYNC_VIEWS = os.getenv('ASYNC_VIEWS', default='False') == 'True'
+
+DEBUG_TOOLBAR = os.getenv('DEBUG_TOOLBAR', default='False') == 'True'
+
+WARM_UP = os.getenv('WARM_UP', default='True') == 'True'
+
 DJANGO_APPS = ('django.contrib.admin',
                'django.contrib.auth',
                'django.contrib.contenttypes',
@@ -39,17 +45,24 @@ LOCAL_APPS = (
 INSTALLED_APPS = DJANGO_APPS + THIRD_PARTY_APPS + LOCAL_APPS
 
 MIDDLEWARE = [
+    'api.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'api.middleware.ProfilingMiddleware',
+    'api.middleware.ReplicaMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'debug_toolbar.middleware.DebugToolbarMiddleware',
     "corsheaders.middleware.CorsMiddleware",
 ]
 
+if DEBUG_TOOLBAR:
+    INSTALLED_APPS += ('debug_toolbar',)
+    MIDDLEWARE.append('debug_toolbar.middleware.DebugToolbarMiddleware')
+    INTERNAL_IPS = ['127.0.0.1']
+
 CORS_ORIGINS_ALLOWED_ALL = True
 ROOT_URLCONF = 'app.urls'
 TEMPLATES_DIR = BASE_DIR / 'templates'
@@ -84,6 +97,21 @@ DATABASES = {
     }
 }
 
+REPLICA_DATABASES = []
+for number, host in enumerate(
+        filter(None, os.getenv('DB_REPLICA_HOSTS', default='').split(',')),
+        1):
+    REPLICA_DATABASES.append(f'replica{number}')
+    DATABASES[f'replica{number}'] = {
+        **DATABASES['default'],
+        'HOST': host.strip(),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['api.db_router.ReplicaRouter']
+
+REPLICA_STICKY_SECONDS = int(os.getenv('REPLICA_STICKY_SECONDS', default=5))
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -110,12 +138,103 @@ USE_THOUSAND_SEPARATOR = True
 
 STATIC_URL = '/static/'
 STATIC_ROOT = 'static/'
+STATICFILES_STORAGE = 'app.storage.CompressedManifestStaticFilesStorage'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+DEFAULT_FILE_STORAGE = 'app.storage.HashedMediaStorage'
 
 POSTS_PER_PAGE = 10
 
+INGREDIENTS_SEARCH_LIMIT = 50
+
+BATCH_RECIPES_LIMIT = 100
+
+EXPORT_CHUNK_SIZE = 500
+
+CATALOG_CACHE_MAX_AGE = 60
+
+FEED_LENGTH = 500
+FEED_TIMEOUT = 60 * 60 * 24
+
+RESPONSE_CACHE_BACKENDS = {
+    'locmem': {
+        'BACKEND': 'api.cache_backends.LocMemCache',
+        'LOCATION': 'responses',
+    },
+    'file': {
+        'BACKEND': 'api.cache_backends.FileBasedCache',
+        'LOCATION': os.getenv('RESPONSE_CACHE_DIR',
+                              default='/tmp/foodgram-responses'),
+    },
+    'redis': {
+        'BACKEND': 'api.cache_backends.RedisCache',
+        'LOCATION': os.getenv('RESPONSE_REDIS_URL',
+                              default='redis://localhost:6379/1'),
+    },
+}
+
+CACHE_BACKENDS = {
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.getenv('CACHE_DIR', default='/tmp/foodgram-cache'),
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    },
+    'redis': {
+        'BACKEND': 'django_redis.cache.RedisCache',
+        'LOCATION': os.getenv('CACHE_REDIS_URL',
+                              default='redis://localhost:6379/0'),
+    },
+}
+
+CACHES = {
+    'default': CACHE_BACKENDS[os.getenv('CACHE', default='locmem')],
+    'responses': {
+        **RESPONSE_CACHE_BACKENDS[os.getenv(
+            'RESPONSE_CACHE', default=os.getenv('CACHE', default='locmem'))],
+        'TIMEOUT': 60 * 5,
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    },
+}
+
+LOCAL_CACHE_TIMEOUT = 60
+
+TOKEN_CACHE_SIZE = 10000
+TOKEN_CACHE_TIMEOUT = 60
+
+SLOW_REQUEST_SECONDS = float(os.getenv('SLOW_REQUEST_SECONDS', default=1))
+SLOW_REQUEST_QUERIES = 5
+
+METRICS_ALLOWED_NETWORKS = [
+    network for network in os.getenv(
+        'METRICS_ALLOWED_NETWORKS',
+        default='127.0.0.0/8,::1/128,10.0.0.0/8,172.16.0.0/12,192.168.0.0/16',
+    ).split(',') if network
+]
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', default='')
+
+PROFILE_DIR = os.getenv('PROFILE_DIR', default='/tmp/foodgram-profiles')
+PROFILE_KEEP = 200
+PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', default=0))
+PROFILE_ROUTES = [
+    route for route in os.getenv('PROFILE_ROUTES', default='').split(',')
+    if route
+]
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'api': {'handlers': ['console'], 'level': 'INFO'},
+    },
+}
+
 AUTH_USER_MODEL = 'users.User'
 
 REST_FRAMEWORK = {
@@ -123,7 +242,7 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.AllowAny',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend',
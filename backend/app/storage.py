@@ -0,0 +1,90 @@
+"""Хранилища статики и медиа с именами по содержимому.
+
+collectstatic кладет рядом с каждым файлом копию с хэшем содержимого в
+имени (ManifestStaticFilesStorage), а для текстовых файлов — сжатые
+варианты .gz и, если установлен пакет brotli, .br; nginx отдает их
+через gzip_static без сжатия на лету. Загруженные изображения
+рецептов сохраняются под хэшем содержимого, поэтому URL файла никогда
+не указывает на другое содержимое и кэшируется навсегда.
+"""
+import gzip
+import hashlib
+import io
+import os
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE = ('.css', '.js', '.map', '.json', '.svg', '.txt', '.html',
+                '.xml', '.ttf', '.eot', '.ico')
+MEDIA_HASH_LENGTH = 32
+
+
+def gzip_bytes(content):
+    """gzip без времени в заголовке: повторная сборка дает те же
+    байты."""
+    buffer = io.BytesIO()
+    with gzip.GzipFile(fileobj=buffer, mode='wb', compresslevel=9,
+                       mtime=0) as archive:
+        archive.write(content)
+    return buffer.getvalue()
+
+
+def compressed_variants(content):
+    yield '.gz', gzip_bytes(content)
+    if brotli is not None:
+        yield '.br', brotli.compress(content)
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Хэшированные имена и заранее сжатые копии текстовых файлов."""
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        for name, hashed_name in self.hashed_files.items():
+            if name.lower().endswith(COMPRESSIBLE):
+                self.compress(name)
+                self.compress(hashed_name)
+
+    def compress(self, name):
+        """Сжатый вариант сохраняется, только если он меньше
+        оригинала."""
+        with self.open(name) as original:
+            content = original.read()
+        for suffix, data in compressed_variants(content):
+            path = name + suffix
+            if self.exists(path):
+                self.delete(path)
+            if len(data) < len(content):
+                self._save(path, ContentFile(data))
+
+
+class HashedMediaStorage(FileSystemStorage):
+    """Файл сохраняется в своем каталоге под sha256 содержимого:
+    одинаковые изображения хранятся один раз, а новое содержимое
+    всегда получает новый URL."""
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        directory, basename = os.path.split(name)
+        extension = os.path.splitext(basename)[1].lower()
+        name = os.path.join(
+            directory, digest.hexdigest()[:MEDIA_HASH_LENGTH] + extension)
+        if self.exists(name):
+            return name
+        return super().save(name, content, max_length)
@@ -1,7 +1,13 @@
 import os
+import time
 
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "app.settings")
 
+started = time.perf_counter()
 application = get_wsgi_application()
+
+from api.warmup import start  # noqa: E402
+
+start(time.perf_counter() - started)
@@ -0,0 +1,26 @@
+import os
+
+preload_app = os.getenv('GUNICORN_PRELOAD', default='True') == 'True'
+
+
+def on_starting(server):
+    """Несколько рабочих процессов с локальными кэшами не видели бы
+    сбросов друг друга: отозванные токены и устаревшие справочники
+    продолжали бы работать в остальных процессах."""
+    if server.cfg.workers < 2:
+        return
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
+    from app.caches import local_caches
+    local = local_caches()
+    if local:
+        raise RuntimeError(
+            f'Кэши {", ".join(local)} локальны для процесса, а рабочих '
+            f'процессов {server.cfg.workers}: задайте CACHE=redis или '
+            f'CACHE=file (и RESPONSE_CACHE) в .env')
+
+
+def post_fork(server, worker):
+    """Соединения мастер-процесса не должны переходить в рабочие."""
+    if server.cfg.preload_app:
+        from django.db import connections
+        connections.close_all()
@@ -3,6 +3,7 @@ from django.utils.safestring import mark_safe
 
 from recipes.models import (Favorite, Ingredient, IngredientInRecipe, Recipe,
                             ShoppingList, Tag, TagInRecipe)
+from recipes.search import search_recipes
 
 
 class IngredientsInline(admin.TabularInline):
@@ -12,8 +13,9 @@ class IngredientsInline(admin.TabularInline):
 
 @admin.register(Recipe)
 class RecipeAdmin(admin.ModelAdmin):
-    list_display = ('id', 'name', 'author', 'text', 'cooking_time', 'preview')
-    readonly_fields = ['preview']
+    list_display = ('id', 'name', 'author', 'text', 'cooking_time',
+                    'favorites_count', 'in_carts_count', 'preview')
+    readonly_fields = ['preview', 'favorites_count', 'in_carts_count']
     search_fields = ('name',)
     list_filter = (
         'author',
@@ -22,6 +24,11 @@ class RecipeAdmin(admin.ModelAdmin):
     )
     exclude = ['ingredients', 'tags']
 
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return queryset, False
+        return search_recipes(queryset, search_term), False
+
     def preview(self, obj):
         return mark_safe(f"<img src='{obj.image.url}' width='60' />")
 
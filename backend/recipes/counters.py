@@ -0,0 +1,53 @@
+"""Денормализованные счетчики и их сверка с реальными данными."""
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from users.models import Subscribe
+from .models import Favorite, Recipe, ShoppingList
+
+User = get_user_model()
+
+COUNTERS = (
+    (Recipe, 'favorites_count', Favorite, 'recipe'),
+    (Recipe, 'in_carts_count', ShoppingList, 'recipe'),
+    (User, 'recipes_count', Recipe, 'author'),
+    (User, 'followers_count', Subscribe, 'author'),
+)
+
+
+def actual_count(related_model, field):
+    """Подзапрос с настоящим количеством связанных записей."""
+    return Coalesce(Subquery(
+        related_model.objects.filter(**{field: OuterRef('pk')})
+        .order_by().values(field)
+        .annotate(total=Count('pk')).values('total')
+    ), 0)
+
+
+def recount(model, counter, related_model, field, batch_size=1000):
+    """Исправляет разошедшиеся счетчики, возвращает число исправленных."""
+    actual = actual_count(related_model, field)
+    drifted = list(
+        model.objects.annotate(actual=actual)
+        .exclude(**{counter: F('actual')})
+        .values_list('pk', flat=True))
+    for start in range(0, len(drifted), batch_size):
+        model.objects.filter(
+            pk__in=drifted[start:start + batch_size],
+        ).update(**{counter: actual_count(related_model, field)})
+    return len(drifted)
+
+
+def refresh_counters(related_model, pks, **fields):
+    """Счетчики по related_model для объектов pks одним UPDATE.
+
+    Для пакетных изменений, которые не вызывают сигналов; в fields
+    передаются поля, обновляемые вместе со счетчиком.
+    """
+    if not pks:
+        return
+    for model, counter, related, field in COUNTERS:
+        if related is related_model:
+            model.objects.filter(pk__in=pks).update(
+                **{counter: actual_count(related, field)}, **fields)
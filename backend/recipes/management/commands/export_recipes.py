@@ -0,0 +1,33 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from recipes.models import Recipe
+from recipes.ndjson import export_lines
+
+
+class Command(BaseCommand):
+    help = ('Потоковая выгрузка рецептов в NDJSON: один рецепт на строку, '
+            'память не зависит от размера каталога')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?', default='-',
+            help='Путь к файлу, по умолчанию стандартный вывод')
+        parser.add_argument(
+            '--chunk-size', type=int, default=500,
+            help='Рецептов на один запрос к базе')
+
+    def handle(self, *args, **options):
+        lines = export_lines(Recipe.objects.order_by('id'),
+                             options['chunk_size'])
+        if options['path'] == '-':
+            sys.stdout.writelines(lines)
+            return
+        exported = 0
+        with open(options['path'], 'w', encoding='utf8') as file:
+            for line in lines:
+                file.write(line)
+                exported += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Выгружено рецептов: {exported}'))
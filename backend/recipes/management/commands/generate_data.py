@@ -0,0 +1,257 @@
+import csv
+import io
+import random
+import time
+import uuid
+from itertools import accumulate, islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from app.caches import delay_notice
+from recipes.models import (Favorite, Ingredient, IngredientInRecipe, Recipe,
+                            ShoppingList, Tag, TagInRecipe)
+from recipes.search import rebuild_index
+from recipes.versions import (INGREDIENTS, TAGS, bump_catalog_version,
+                              invalidate_all)
+from users.models import Subscribe, User
+
+DISHES = ('Суп', 'Салат', 'Пирог', 'Каша', 'Омлет', 'Рагу', 'Паста',
+          'Запеканка', 'Котлеты', 'Блины')
+QUALIFIERS = ('домашний', 'быстрый', 'летний', 'острый', 'постный',
+              'праздничный', 'бабушкин', 'сытный')
+UNITS = ('г', 'кг', 'мл', 'л', 'шт.', 'ст. л.', 'ч. л.', 'по вкусу')
+TEXT = 'Подготовить ингредиенты, смешать и довести до готовности.'
+IMAGE = 'images/generated.jpg'
+INGREDIENTS_PER_RECIPE = (5, 20)
+TAGS_PER_RECIPE = 3
+ZIPF_EXPONENT = 1.1
+USER_FIELDS = ('id', 'username', 'email', 'password', 'first_name',
+               'last_name', 'role', 'is_staff', 'is_superuser', 'is_active',
+               'date_joined', 'recipes_count', 'followers_count')
+RECIPE_FIELDS = ('id', 'author_id', 'name', 'text', 'cooking_time', 'image',
+                 'favorites_count', 'in_carts_count', 'updated_at')
+
+
+class Zipf:
+    """Выбор id с вероятностью, обратной рангу в степени exponent:
+    несколько популярных id и длинный хвост."""
+
+    def __init__(self, ids, exponent=ZIPF_EXPONENT):
+        self.ids = ids
+        self.cum_weights = list(accumulate(
+            1 / rank ** exponent for rank in range(1, len(ids) + 1)))
+
+    def sample(self, rnd, k, exclude=None):
+        """До k разных id; популярные выпадают чаще."""
+        if not k:
+            return []
+        picked = dict.fromkeys(
+            rnd.choices(self.ids, cum_weights=self.cum_weights, k=k * 2))
+        picked.pop(exclude, None)
+        return list(picked)[:k]
+
+
+def next_id(model):
+    return (model.objects.aggregate(Max('id'))['id__max'] or 0) + 1
+
+
+def bulk_insert(model, fields, rows):
+    model.objects.bulk_create(
+        [model(**dict(zip(fields, row))) for row in rows])
+
+
+def copy_insert(model, fields, rows):
+    """Вставка пачки через COPY прямо в таблицу (PostgreSQL)."""
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    buffer.seek(0)
+    columns = ', '.join(model._meta.get_field(field).column
+                        for field in fields)
+    with connection.cursor() as cursor:
+        cursor.cursor.copy_expert(
+            f'COPY {model._meta.db_table} ({columns}) '
+            f'FROM STDIN WITH (FORMAT csv)', buffer)
+
+
+def reset_sequences(models):
+    """Последовательности id после вставки с явными id (PostgreSQL)."""
+    with connection.cursor() as cursor:
+        for sql in connection.ops.sequence_reset_sql(no_style(), models):
+            cursor.execute(sql)
+
+
+class Command(BaseCommand):
+    help = ('Генерация воспроизводимого набора данных для нагрузочных '
+            'проверок: пользователи, авторы с перекосом популярности, '
+            'рецепты, избранное, списки покупок и подписки')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument(
+            '--authors', type=float, default=0.1,
+            help='Доля пользователей, публикующих рецепты')
+        parser.add_argument('--recipes', type=int, default=10000)
+        parser.add_argument('--ingredients', type=int, default=2000)
+        parser.add_argument(
+            '--tags', type=int, default=6,
+            help='Недостающие теги до этого числа создаются')
+        parser.add_argument(
+            '--favorites', type=float, default=20,
+            help='Среднее число рецептов в избранном у пользователя')
+        parser.add_argument(
+            '--carts', type=float, default=3,
+            help='Среднее число рецептов в списке покупок')
+        parser.add_argument(
+            '--subscriptions', type=float, default=10,
+            help='Среднее число подписок у пользователя')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--prefix', default=None,
+            help='Префикс имен и email пользователей, по умолчанию '
+                 'случайный: повторный запуск не пересекается с '
+                 'существующими пользователями')
+        parser.add_argument(
+            '--batch-size', type=int, default=5000,
+            help='Строк в одной транзакции')
+        parser.add_argument(
+            '--no-copy', action='store_true',
+            help='Не использовать COPY даже на PostgreSQL')
+
+    def handle(self, *args, **options):
+        """Новые строки получают явные id после существующих, поэтому
+        связи строятся без чтения вставленных данных обратно. После
+        вставки сверяются счетчики и перестраивается поисковый индекс."""
+        self.random = random.Random(options['seed'])
+        self.options = options
+        self.prefix = options['prefix'] or uuid.uuid4().hex[:8]
+        use_copy = (connection.vendor == 'postgresql'
+                    and not options['no_copy'])
+        self.write_rows = copy_insert if use_copy else bulk_insert
+        started = time.monotonic()
+        tags = self.ensure_tags(options['tags'])
+        users = self.insert_users(options['users'])
+        authors = users[:max(int(len(users) * options['authors']), 1)]
+        ingredients = self.insert_ingredients(options['ingredients'])
+        recipes = self.insert_recipes(options['recipes'], Zipf(authors))
+        self.insert_contents(recipes, Zipf(ingredients), tags)
+        self.random.shuffle(recipes)
+        popular = Zipf(recipes)
+        self.insert_choices(Favorite, users, popular, options['favorites'])
+        self.insert_choices(ShoppingList, users, popular, options['carts'])
+        self.insert_subscriptions(users, Zipf(authors),
+                                  options['subscriptions'])
+        reset_sequences([User, Ingredient, Recipe])
+        call_command('recount_counters', stdout=self.stdout)
+        rebuild_index()
+        bump_catalog_version(TAGS)
+        bump_catalog_version(INGREDIENTS)
+        invalidate_all()
+        notice = delay_notice()
+        if notice:
+            self.stdout.write(self.style.WARNING(notice))
+        self.stdout.write(self.style.SUCCESS(
+            f'Данные сгенерированы за {time.monotonic() - started:.1f} с'))
+
+    def insert(self, model, fields, rows):
+        """Вставка пачками по batch-size; возвращает число строк."""
+        started = time.monotonic()
+        total = 0
+        rows = iter(rows)
+        while True:
+            batch = list(islice(rows, self.options['batch_size']))
+            if not batch:
+                break
+            with transaction.atomic():
+                self.write_rows(model, fields, batch)
+            total += len(batch)
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            f'{model._meta.verbose_name_plural}: {total} строк, '
+            f'{total / max(elapsed, 1e-6):.0f} строк/с')
+        return total
+
+    def ensure_tags(self, count):
+        tags = list(Tag.objects.values_list('id', flat=True))
+        colors = set(Tag.objects.values_list('color', flat=True))
+        number = 0
+        while len(tags) < count:
+            number += 1
+            color = f'#{number * 0x9E3779 % 0x1000000:06X}'
+            if color in colors:
+                continue
+            tag, created = Tag.objects.get_or_create(
+                slug=f'tag-{number}',
+                defaults={'name': f'Тег {number}', 'color': color})
+            if created:
+                tags.append(tag.id)
+        return tags
+
+    def insert_users(self, count):
+        start = next_id(User)
+        password = make_password(None)
+        now = timezone.now()
+        prefix = self.prefix
+        self.insert(User, USER_FIELDS, (
+            (pk, f'{prefix}-user{pk}', f'{prefix}-user{pk}@example.com',
+             password, f'Имя {pk}', f'Фамилия {pk}', User.Role.USER, False,
+             False, True, now, 0, 0)
+            for pk in range(start, start + count)))
+        return list(range(start, start + count))
+
+    def insert_ingredients(self, count):
+        start = next_id(Ingredient)
+        self.insert(Ingredient, ('id', 'name', 'measurement_unit'), (
+            (pk, f'ингредиент {pk}', self.random.choice(UNITS))
+            for pk in range(start, start + count)))
+        return list(range(start, start + count))
+
+    def insert_recipes(self, count, authors):
+        start = next_id(Recipe)
+        now = timezone.now()
+        rnd = self.random
+        self.insert(Recipe, RECIPE_FIELDS, (
+            (pk, authors.sample(rnd, 1)[0],
+             f'{rnd.choice(DISHES)} {rnd.choice(QUALIFIERS)} {pk}', TEXT,
+             rnd.randint(5, 180), IMAGE, 0, 0, now)
+            for pk in range(start, start + count)))
+        return list(range(start, start + count))
+
+    def insert_contents(self, recipes, ingredients, tags):
+        """Ингредиенты рецептов (частые встречаются чаще) и теги."""
+        rnd = self.random
+        self.insert(
+            IngredientInRecipe, ('recipe_id', 'ingredient_id', 'amount'), (
+                (recipe, ingredient, rnd.randint(1, 500))
+                for recipe in recipes
+                for ingredient in ingredients.sample(
+                    rnd, rnd.randint(*INGREDIENTS_PER_RECIPE))))
+        self.insert(TagInRecipe, ('recipe_id', 'tag_id'), (
+            (recipe, tag)
+            for recipe in recipes
+            for tag in rnd.sample(tags, rnd.randint(
+                min(1, len(tags)), min(TAGS_PER_RECIPE, len(tags))))))
+
+    def per_user(self, mean):
+        """Число записей у пользователя: у большинства мало, у
+        немногих много."""
+        return int(self.random.expovariate(1 / mean)) if mean else 0
+
+    def insert_choices(self, model, users, recipes, mean):
+        self.insert(model, ('user_id', 'recipe_id'), (
+            (user, recipe)
+            for user in users
+            for recipe in recipes.sample(self.random, self.per_user(mean))))
+
+    def insert_subscriptions(self, users, authors, mean):
+        """Подписки тянутся к популярным авторам."""
+        self.insert(Subscribe, ('user_id', 'author_id'), (
+            (user, author)
+            for user in users
+            for author in authors.sample(
+                self.random, self.per_user(mean), exclude=user)))
@@ -1,12 +1,21 @@
+import csv
+import io
+import json
 import logging
-from csv import DictReader
+import time
+from itertools import islice
 
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
 
+from app.caches import delay_notice
 from recipes.models import Ingredient
+from recipes.versions import INGREDIENTS, bump_catalog_version
 
 MESSAGE = 'Данные успешно загружены в таблицу'
 SUCCESS_MESSAGE = 'Все данные успешно загружены'
+FIELDS = ('name', 'measurement_unit')
+JSON_CHUNK_SIZE = 64 * 1024
 
 
 logging.basicConfig(
@@ -15,34 +24,140 @@ logging.basicConfig(
     filemode='a')
 
 
-class Command(BaseCommand):
-    help = 'Команда для создания БД на основе имеющихся csv файлов'
+def read_csv(file):
+    """Строки csv-файла без заголовка."""
+    for row in csv.DictReader(file, fieldnames=FIELDS):
+        yield row
+
+
+def skip_separators(buffer, position):
+    """Пропускает пробелы и запятые между элементами json-массива."""
+    while position < len(buffer) and buffer[position] in ' \t\r\n,':
+        position += 1
+    return position
+
+
+def read_json(file):
+    """Потоковое чтение json-массива объектов без загрузки файла целиком."""
+    decoder = json.JSONDecoder()
+    buffer = file.read(JSON_CHUNK_SIZE).lstrip()
+    if not buffer.startswith('['):
+        raise CommandError('Ожидается json-массив ингредиентов')
+    buffer = buffer[1:]
+    while True:
+        position = 0
+        while True:
+            position = skip_separators(buffer, position)
+            if buffer.startswith(']', position):
+                return
+            try:
+                row, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                break
+            yield row
+        chunk = file.read(JSON_CHUNK_SIZE)
+        if not chunk:
+            raise CommandError('Файл json обрывается посередине')
+        buffer = buffer[position:] + chunk
+
+
+READERS = {
+    'csv': read_csv,
+    'json': read_json,
+}
+
 
-    def ingredient_create(row):
-        Ingredient.objects.create(
-            name=row['name'],
-            measurement_unit=row['measurement_unit'])
+def batches(rows, size):
+    """Пачки уникальных (name, measurement_unit) не больше size."""
+    rows = iter(rows)
+    while True:
+        batch = {}
+        for row in islice(rows, size):
+            name = row['name'].strip()
+            unit = row['measurement_unit'].strip()
+            if name and unit:
+                batch[(name, unit)] = None
+        if not batch:
+            return
+        yield list(batch)
+
+
+def bulk_insert(batch):
+    """Вставка пачки с пропуском уже существующих ингредиентов."""
+    Ingredient.objects.bulk_create(
+        [Ingredient(name=name, measurement_unit=unit)
+         for name, unit in batch],
+        ignore_conflicts=True)
+
+
+def copy_insert(batch):
+    """Вставка пачки через COPY во временную таблицу (PostgreSQL)."""
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(batch)
+    buffer.seek(0)
+    table = Ingredient._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'CREATE TEMP TABLE ingredients_import '
+            '(name varchar(200), measurement_unit text) ON COMMIT DROP')
+        cursor.cursor.copy_expert(
+            'COPY ingredients_import FROM STDIN WITH (FORMAT csv)', buffer)
+        cursor.execute(
+            f'INSERT INTO {table} (name, measurement_unit) '
+            f'SELECT name, measurement_unit FROM ingredients_import '
+            f'ON CONFLICT (name, measurement_unit) DO NOTHING')
+
+
+class Command(BaseCommand):
+    help = ('Загрузка ингредиентов из csv или json файла пачками, '
+            'без дубликатов (name, measurement_unit)')
 
-    ACTIONS = [
-        (ingredient_create, Ingredient, 'ingredients.csv'),
-    ]
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?', default='ingredients.csv',
+            help='Путь к ingredients.csv или ingredients.json')
+        parser.add_argument(
+            '--format', choices=READERS, default=None,
+            help='Формат файла, по умолчанию по расширению')
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Размер пачки для вставки')
+        parser.add_argument(
+            '--no-copy', action='store_true',
+            help='Не использовать COPY даже на PostgreSQL')
 
     def handle(self, *args, **options):
-        logging.info('Загрузка данных из csv в базу:')
-        for func, model, file in self.ACTIONS:
-            if model.objects.exists():
-                logging.info('Таблица уже содержит данные.')
-            for row in DictReader(
-                open(
-                    f'{file}',
-                    encoding='utf8'),
-                fieldnames=[
-                    'name',
-                    'measurement_unit']):
-                try:
-                    func(row)
-                except BaseException:
-                    print(f'Не залилось! {row}')
-                    logging.exception("message")
-            logging.info(MESSAGE)
+        path = options['path']
+        file_format = options['format'] or path.rsplit('.', 1)[-1].lower()
+        if file_format not in READERS:
+            raise CommandError(f'Неизвестный формат файла: {path}')
+        use_copy = (connection.vendor == 'postgresql'
+                    and not options['no_copy'])
+        insert = copy_insert if use_copy else bulk_insert
+        logging.info('Загрузка ингредиентов из %s в базу:', path)
+        before = Ingredient.objects.count()
+        started = time.monotonic()
+        processed = 0
+        with open(path, encoding='utf8', newline='') as file:
+            for batch in batches(READERS[file_format](file),
+                                 options['batch_size']):
+                with transaction.atomic():
+                    insert(batch)
+                processed += len(batch)
+                elapsed = time.monotonic() - started
+                self.stdout.write(
+                    f'Обработано {processed} строк, '
+                    f'{processed / max(elapsed, 1e-6):.0f} строк/с')
+        created = Ingredient.objects.count() - before
+        if created:
+            bump_catalog_version(INGREDIENTS)
+            notice = delay_notice()
+            if notice:
+                self.stdout.write(self.style.WARNING(notice))
+        elapsed = time.monotonic() - started
+        logging.info(MESSAGE)
+        self.stdout.write(self.style.SUCCESS(
+            f'{SUCCESS_MESSAGE}: добавлено {created}, '
+            f'пропущено дубликатов {processed - created}, '
+            f'{elapsed:.2f} с'))
         logging.info(SUCCESS_MESSAGE)
@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from app.caches import delay_notice
+from recipes.ndjson import import_lines
+
+
+class Command(BaseCommand):
+    help = ('Загрузка рецептов из NDJSON пачками: рецепты, ингредиенты и '
+            'теги рецептов вставляются bulk_create')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Путь к файлу NDJSON')
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Рецептов в одной транзакции')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        created = 0
+        with open(options['path'], encoding='utf8') as file:
+            for count, skipped in import_lines(file, options['batch_size']):
+                created += count
+                for number, reason in skipped:
+                    self.stderr.write(f'Строка {number} пропущена: {reason}')
+                elapsed = time.monotonic() - started
+                self.stdout.write(
+                    f'Загружено {created} рецептов, '
+                    f'{created / max(elapsed, 1e-6):.0f} рецептов/с')
+        notice = delay_notice()
+        if created and notice:
+            self.stdout.write(self.style.WARNING(notice))
+        self.stdout.write(self.style.SUCCESS(
+            f'Загрузка завершена: {created} рецептов, '
+            f'{time.monotonic() - started:.2f} с'))
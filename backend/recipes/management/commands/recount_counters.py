@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.counters import COUNTERS, recount
+
+
+class Command(BaseCommand):
+    help = ('Сверка счетчиков избранного, списков покупок, рецептов '
+            'и подписчиков с реальными данными')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Сколько записей исправлять одним UPDATE')
+
+    def handle(self, *args, **options):
+        for model, counter, related_model, field in COUNTERS:
+            with transaction.atomic():
+                fixed = recount(model, counter, related_model, field,
+                                options['batch_size'])
+            self.stdout.write(
+                f'{model._meta.label}.{counter}: исправлено {fixed}')
+        self.stdout.write(self.style.SUCCESS('Счетчики сверены'))
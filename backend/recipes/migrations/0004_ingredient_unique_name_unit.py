@@ -0,0 +1,43 @@
+from django.db import migrations, models
+
+
+def merge_duplicate_ingredients(apps, schema_editor):
+    """Оставляет по одному ингредиенту на (name, measurement_unit)."""
+    Ingredient = apps.get_model('recipes', 'Ingredient')
+    IngredientInRecipe = apps.get_model('recipes', 'IngredientInRecipe')
+    duplicates = (
+        Ingredient.objects.values('name', 'measurement_unit')
+        .annotate(keep_id=models.Min('id'), total=models.Count('id'))
+        .filter(total__gt=1)
+        .order_by()
+    )
+    for duplicate in duplicates.iterator():
+        extra = Ingredient.objects.filter(
+            name=duplicate['name'],
+            measurement_unit=duplicate['measurement_unit'],
+        ).exclude(id=duplicate['keep_id'])
+        for link in IngredientInRecipe.objects.filter(ingredient__in=extra):
+            if IngredientInRecipe.objects.filter(
+                    recipe_id=link.recipe_id,
+                    ingredient_id=duplicate['keep_id']).exists():
+                link.delete()
+            else:
+                link.ingredient_id = duplicate['keep_id']
+                link.save(update_fields=['ingredient'])
+        extra.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0003_add_UniqueConstraint'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_ingredients,
+                             migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='ingredient',
+            constraint=models.UniqueConstraint(fields=('name', 'measurement_unit'), name='Ингредиент с такой единицей измерения уже есть!'),
+        ),
+    ]
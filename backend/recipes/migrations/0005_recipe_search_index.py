@@ -0,0 +1,95 @@
+import re
+
+from django.db import migrations
+
+# Снимок схемы индекса из recipes.search на момент миграции: дальнейшие
+# изменения модуля поиска не должны менять уже примененную миграцию.
+WORD = re.compile(r'\w+')
+RUSSIAN_ENDINGS = sorted((
+    'иями', 'ями', 'ами', 'ого', 'его', 'ому', 'ему', 'ыми', 'ими',
+    'ой', 'ей', 'ий', 'ый', 'ая', 'яя', 'ое', 'ее', 'ые', 'ие', 'ов',
+    'ев', 'ах', 'ях', 'ам', 'ям', 'ом', 'ем', 'ую', 'юю', 'ию', 'ия',
+    'ть', 'а', 'я', 'о', 'е', 'ы', 'и', 'у', 'ю', 'ь', 'й',
+), key=len, reverse=True)
+MIN_STEM_LENGTH = 3
+
+POSTGRES_CREATE = (
+    'CREATE TABLE IF NOT EXISTS recipes_recipe_search ('
+    'recipe_id bigint PRIMARY KEY '
+    'REFERENCES recipes_recipe (id) ON DELETE CASCADE, '
+    'document tsvector NOT NULL)',
+    'CREATE INDEX IF NOT EXISTS recipes_recipe_search_document '
+    'ON recipes_recipe_search USING GIN (document)',
+    "INSERT INTO recipes_recipe_search (recipe_id, document) "
+    "SELECT r.id, "
+    "setweight(to_tsvector('russian', r.name), 'A') || "
+    "setweight(to_tsvector('russian', "
+    "coalesce(string_agg(i.name, ' '), '')), 'B') || "
+    "setweight(to_tsvector('russian', r.text), 'C') "
+    "FROM recipes_recipe r "
+    "LEFT JOIN recipes_ingredientinrecipe ir ON ir.recipe_id = r.id "
+    "LEFT JOIN recipes_ingredient i ON i.id = ir.ingredient_id "
+    "GROUP BY r.id",
+)
+POSTGRES_DROP = 'DROP TABLE IF EXISTS recipes_recipe_search'
+
+SQLITE_CREATE = ('CREATE VIRTUAL TABLE IF NOT EXISTS recipes_recipe_fts '
+                 'USING fts5(name, ingredients, text)')
+SQLITE_SELECT = (
+    "SELECT r.id, r.name, group_concat(i.name, ' '), r.text "
+    "FROM recipes_recipe r "
+    "LEFT JOIN recipes_ingredientinrecipe ir ON ir.recipe_id = r.id "
+    "LEFT JOIN recipes_ingredient i ON i.id = ir.ingredient_id "
+    "GROUP BY r.id"
+)
+SQLITE_INSERT = ('INSERT INTO recipes_recipe_fts '
+                 '(rowid, name, ingredients, text) VALUES (%s, %s, %s, %s)')
+SQLITE_DROP = 'DROP TABLE IF EXISTS recipes_recipe_fts'
+
+
+def stem(word):
+    word = word.casefold().replace('ё', 'е')
+    for ending in RUSSIAN_ENDINGS:
+        if (word.endswith(ending)
+                and len(word) - len(ending) >= MIN_STEM_LENGTH):
+            return word[:-len(ending)]
+    return word
+
+
+def stem_text(text):
+    return ' '.join(stem(word) for word in WORD.findall(text or ''))
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    with schema_editor.connection.cursor() as cursor:
+        if vendor == 'postgresql':
+            for sql in POSTGRES_CREATE:
+                cursor.execute(sql)
+        elif vendor == 'sqlite':
+            cursor.execute(SQLITE_CREATE)
+            cursor.execute(SQLITE_SELECT)
+            cursor.executemany(SQLITE_INSERT, [
+                (recipe_id, stem_text(name), stem_text(ingredients),
+                 stem_text(text))
+                for recipe_id, name, ingredients, text in cursor.fetchall()
+            ])
+
+
+def drop_search_index(apps, schema_editor):
+    drop = {'postgresql': POSTGRES_DROP, 'sqlite': SQLITE_DROP}.get(
+        schema_editor.connection.vendor)
+    if drop:
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute(drop)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0004_ingredient_unique_name_unit'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
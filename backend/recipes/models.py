@@ -16,6 +16,10 @@ class Ingredient(models.Model):
     class Meta:
         verbose_name_plural = 'Ингредиенты'
         verbose_name = 'Ингредиент'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['name', 'measurement_unit'],
+                name='Ингредиент с такой единицей измерения уже есть!')]
 
     def __str__(self):
         return f'{self.name} {self.measurement_unit}'
@@ -80,6 +84,17 @@ class Recipe(models.Model):
         verbose_name='Картинка, закодированная в Base64',
         blank=True,
         upload_to='images/')
+    favorites_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='В избранном')
+    in_carts_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='В списках покупок')
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата изменения')
 
     class Meta:
         verbose_name_plural = 'Рецепты'
@@ -0,0 +1,244 @@
+"""Экспорт и импорт рецептов в формате NDJSON.
+
+Одна строка — один рецепт. Связи записываются естественными ключами,
+чтобы файл можно было перенести в другое окружение: автор — email,
+теги — slug, ингредиенты — название и единица измерения. Картинка
+записывается путем в MEDIA_ROOT, сами файлы переносятся отдельно.
+"""
+import json
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.db.models import Prefetch, prefetch_related_objects
+
+from .counters import refresh_counters
+from .models import Ingredient, IngredientInRecipe, Recipe, Tag, TagInRecipe
+from .search import index_recipes
+from .versions import (INGREDIENTS, bump_catalog_version,
+                       drop_followers_timelines, invalidate_recipes)
+
+User = get_user_model()
+
+FIELDS = ('author', 'name', 'text', 'cooking_time', 'image', 'tags',
+          'ingredients')
+
+
+def recipe_record(recipe):
+    return {
+        'id': recipe.id,
+        'author': recipe.author.email,
+        'name': recipe.name,
+        'text': recipe.text,
+        'cooking_time': recipe.cooking_time,
+        'image': recipe.image.name,
+        'tags': [tag.slug for tag in recipe.tags.all()],
+        'ingredients': [
+            {'name': item.ingredient.name,
+             'measurement_unit': item.ingredient.measurement_unit,
+             'amount': item.amount}
+            for item in recipe.ingredient_list.all()
+        ],
+    }
+
+
+def export_lines(queryset, chunk_size):
+    """Строки NDJSON по рецептам queryset.
+
+    iterator() в Django 3.2 не выполняет prefetch_related, поэтому
+    теги и ингредиенты догружаются на каждую пачку из chunk_size
+    рецептов: в памяти не больше одной пачки.
+    """
+    recipes = queryset.select_related('author').iterator(
+        chunk_size=chunk_size)
+    while True:
+        chunk = list(islice(recipes, chunk_size))
+        if not chunk:
+            return
+        prefetch_related_objects(chunk, 'tags', Prefetch(
+            'ingredient_list',
+            queryset=IngredientInRecipe.objects.select_related('ingredient'),
+        ))
+        for recipe in chunk:
+            yield json.dumps(recipe_record(recipe), ensure_ascii=False) + '\n'
+
+
+def read_records(lines):
+    """Номера строк и разобранные записи; пустые строки пропускаются,
+    для строки с некорректным JSON вместо записи — ошибка разбора."""
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield number, json.loads(line)
+        except json.JSONDecodeError as error:
+            yield number, error
+
+
+def ingredient_ids(records):
+    """id ингредиентов по (название, единица) из принятых записей;
+    недостающие создаются."""
+    pairs = {(item['name'], item['measurement_unit'])
+             for record in records for item in record['ingredients']}
+    if not pairs:
+        return {}
+
+    def existing():
+        rows = Ingredient.objects.filter(
+            name__in={name for name, _ in pairs},
+        ).values_list('id', 'name', 'measurement_unit')
+        return {(name, unit): pk for pk, name, unit in rows}
+
+    found = existing()
+    missing = pairs - set(found)
+    if missing:
+        Ingredient.objects.bulk_create(
+            [Ingredient(name=name, measurement_unit=unit)
+             for name, unit in missing],
+            ignore_conflicts=True)
+        bump_catalog_version(INGREDIENTS)
+        found = existing()
+    return found
+
+
+def positive_int(value):
+    """bool — подкласс int, но в JSON это не число."""
+    return (isinstance(value, int) and not isinstance(value, bool)
+            and value >= 1)
+
+
+def short_str(value, model, field):
+    return (isinstance(value, str) and value
+            and len(value) <= model._meta.get_field(field).max_length)
+
+
+def check_ingredient(item):
+    if not isinstance(item, dict):
+        return 'ингредиент должен быть объектом JSON'
+    if not short_str(item.get('name'), Ingredient, 'name'):
+        return 'некорректное название ингредиента'
+    if not short_str(item.get('measurement_unit'), Ingredient,
+                     'measurement_unit'):
+        return f'некорректная единица измерения у {item["name"]}'
+    if not positive_int(item.get('amount')):
+        return f'количество {item["name"]} должно быть целым числом от 1'
+    return None
+
+
+def check_values(record):
+    if not isinstance(record['author'], str):
+        return 'автор задается email'
+    if not short_str(record['name'], Recipe, 'name'):
+        return ('название должно быть непустой строкой не длиннее '
+                f'{Recipe._meta.get_field("name").max_length} символов')
+    if not isinstance(record['text'], str):
+        return 'описание должно быть строкой'
+    if not isinstance(record['image'], str):
+        return 'картинка должна быть путем в MEDIA_ROOT'
+    if not positive_int(record['cooking_time']):
+        return 'время приготовления должно быть целым числом от 1'
+    if not isinstance(record['tags'], list) or not all(
+            isinstance(slug, str) for slug in record['tags']):
+        return 'теги должны быть списком slug'
+    if not isinstance(record['ingredients'], list):
+        return 'ингредиенты должны быть списком'
+    for item in record['ingredients']:
+        reason = check_ingredient(item)
+        if reason:
+            return reason
+    return None
+
+
+def check_record(record, authors, tags):
+    """Причина пропуска записи или None, если запись можно сохранить."""
+    if isinstance(record, json.JSONDecodeError):
+        return f'некорректный JSON: {record}'
+    if not isinstance(record, dict):
+        return 'ожидается объект JSON'
+    missing = [field for field in FIELDS if field not in record]
+    if missing:
+        return f'нет полей {", ".join(missing)}'
+    reason = check_values(record)
+    if reason:
+        return reason
+    if record['author'] not in authors:
+        return f'нет автора {record["author"]}'
+    unknown = set(record['tags']) - set(tags)
+    if unknown:
+        return f'нет тегов {", ".join(sorted(unknown))}'
+    return None
+
+
+def save_recipes(recipes):
+    """Вставка пачкой, если база возвращает id (PostgreSQL), иначе
+    по одному."""
+    if connection.features.can_return_rows_from_bulk_insert:
+        return Recipe.objects.bulk_create(recipes)
+    for recipe in recipes:
+        recipe.save()
+    return recipes
+
+
+@transaction.atomic
+def import_batch(records):
+    """Импорт пачки записей; возвращает число созданных рецептов и
+    список (номер строки, причина) пропущенных."""
+    authors = dict(User.objects.filter(
+        email__in={record['author'] for _, record in records
+                   if isinstance(record, dict)
+                   and isinstance(record.get('author'), str)},
+    ).values_list('email', 'id'))
+    tags = dict(Tag.objects.values_list('slug', 'id'))
+    skipped, accepted = [], []
+    for number, record in records:
+        reason = check_record(record, authors, tags)
+        if reason:
+            skipped.append((number, reason))
+        else:
+            accepted.append(record)
+    ingredients = ingredient_ids(accepted)
+    recipes = save_recipes([
+        Recipe(author_id=authors[record['author']], name=record['name'],
+               text=record['text'], cooking_time=record['cooking_time'],
+               image=record['image'])
+        for record in accepted
+    ])
+    tag_rows, ingredient_rows = {}, {}
+    for recipe, record in zip(recipes, accepted):
+        for slug in record['tags']:
+            tag_rows[(recipe.id, tags[slug])] = None
+        for item in record['ingredients']:
+            key = (item['name'], item['measurement_unit'])
+            ingredient_rows[(recipe.id, ingredients[key])] = item['amount']
+    TagInRecipe.objects.bulk_create(
+        [TagInRecipe(recipe_id=recipe_id, tag_id=tag_id)
+         for recipe_id, tag_id in tag_rows])
+    IngredientInRecipe.objects.bulk_create(
+        [IngredientInRecipe(recipe_id=recipe_id, ingredient_id=ingredient_id,
+                            amount=amount)
+         for (recipe_id, ingredient_id), amount in ingredient_rows.items()])
+    recipe_ids = [recipe.id for recipe in recipes]
+    author_ids = list({recipe.author_id for recipe in recipes})
+    refresh_counters(Recipe, author_ids)
+    transaction.on_commit(lambda: imported(recipe_ids, author_ids))
+    return len(recipes), skipped
+
+
+def imported(recipe_ids, author_ids):
+    """То, что при создании по одному делают сигналы: поисковый индекс,
+    кэш ответов и ленты подписчиков."""
+    index_recipes(recipe_ids)
+    invalidate_recipes(recipe_ids)
+    drop_followers_timelines(author_ids)
+
+
+def import_lines(lines, batch_size):
+    """Импорт строк NDJSON пачками по batch_size; возвращает итоги
+    по пачкам: (создано, пропущенные строки)."""
+    records = read_records(lines)
+    while True:
+        batch = list(islice(records, batch_size))
+        if not batch:
+            return
+        yield import_batch(batch)
@@ -0,0 +1,165 @@
+"""Полнотекстовый поиск рецептов по названию, описанию и ингредиентам.
+
+На PostgreSQL индекс хранится в таблице recipes_recipe_search
+(tsvector с русской морфологией и GIN-индекс), на SQLite — в
+виртуальной таблице FTS5 recipes_recipe_fts; таблицы создает миграция
+0005_recipe_search_index. Индекс обновляется после коммита для
+рецептов, измененных в транзакции, и при удалении рецепта.
+"""
+import re
+
+from django.db import connection
+from django.db.models.expressions import RawSQL
+
+WORD = re.compile(r'\w+')
+RUSSIAN_ENDINGS = sorted((
+    'иями', 'ями', 'ами', 'ого', 'его', 'ому', 'ему', 'ыми', 'ими',
+    'ой', 'ей', 'ий', 'ый', 'ая', 'яя', 'ое', 'ее', 'ые', 'ие', 'ов',
+    'ев', 'ах', 'ях', 'ам', 'ям', 'ом', 'ем', 'ую', 'юю', 'ию', 'ия',
+    'ть', 'а', 'я', 'о', 'е', 'ы', 'и', 'у', 'ю', 'ь', 'й',
+), key=len, reverse=True)
+MIN_STEM_LENGTH = 3
+
+
+def stem(word):
+    """Упрощенное отсечение русских окончаний для FTS5."""
+    word = word.casefold().replace('ё', 'е')
+    for ending in RUSSIAN_ENDINGS:
+        if (word.endswith(ending)
+                and len(word) - len(ending) >= MIN_STEM_LENGTH):
+            return word[:-len(ending)]
+    return word
+
+
+def stem_text(text):
+    return ' '.join(stem(word) for word in WORD.findall(text))
+
+
+def placeholders(values):
+    return ', '.join(['%s'] * len(values))
+
+
+class PostgresSearch:
+    table = 'recipes_recipe_search'
+    document = (
+        "setweight(to_tsvector('russian', r.name), 'A') || "
+        "setweight(to_tsvector('russian', "
+        "coalesce(string_agg(i.name, ' '), '')), 'B') || "
+        "setweight(to_tsvector('russian', r.text), 'C')"
+    )
+
+    def index(self, cursor, ids=None):
+        where, params = '', ()
+        if ids is not None:
+            where, params = 'WHERE r.id = ANY(%s)', (list(ids),)
+        cursor.execute(
+            f'INSERT INTO {self.table} (recipe_id, document) '
+            f'SELECT r.id, {self.document} FROM recipes_recipe r '
+            f'LEFT JOIN recipes_ingredientinrecipe ir '
+            f'ON ir.recipe_id = r.id '
+            f'LEFT JOIN recipes_ingredient i ON i.id = ir.ingredient_id '
+            f'{where} GROUP BY r.id '
+            f'ON CONFLICT (recipe_id) '
+            f'DO UPDATE SET document = EXCLUDED.document', params)
+
+    def remove(self, cursor, ids):
+        cursor.execute(
+            f'DELETE FROM {self.table} WHERE recipe_id = ANY(%s)',
+            (list(ids),))
+
+    def search(self, queryset, query):
+        tsquery = "plainto_tsquery('russian', %s)"
+        return queryset.filter(id__in=RawSQL(
+            f'SELECT recipe_id FROM {self.table} '
+            f'WHERE document @@ {tsquery}', (query,),
+        )).annotate(search_rank=RawSQL(
+            f'SELECT ts_rank(document, {tsquery}) FROM {self.table} '
+            f'WHERE recipe_id = recipes_recipe.id', (query,),
+        ))
+
+
+class SqliteSearch:
+    table = 'recipes_recipe_fts'
+
+    def index(self, cursor, ids=None):
+        where, params = '', []
+        if ids is not None:
+            ids = list(ids)
+            self.remove(cursor, ids)
+            where, params = f'WHERE r.id IN ({placeholders(ids)})', ids
+        else:
+            cursor.execute(f'DELETE FROM {self.table}')
+        cursor.execute(
+            f"SELECT r.id, r.name, group_concat(i.name, ' '), r.text "
+            f'FROM recipes_recipe r '
+            f'LEFT JOIN recipes_ingredientinrecipe ir '
+            f'ON ir.recipe_id = r.id '
+            f'LEFT JOIN recipes_ingredient i ON i.id = ir.ingredient_id '
+            f'{where} GROUP BY r.id', params)
+        rows = [(recipe_id, stem_text(name), stem_text(ingredients or ''),
+                 stem_text(text))
+                for recipe_id, name, ingredients, text in cursor.fetchall()]
+        cursor.executemany(
+            f'INSERT INTO {self.table} (rowid, name, ingredients, text) '
+            f'VALUES (%s, %s, %s, %s)', rows)
+
+    def remove(self, cursor, ids):
+        ids = list(ids)
+        cursor.execute(
+            f'DELETE FROM {self.table} WHERE rowid IN ({placeholders(ids)})',
+            ids)
+
+    def search(self, queryset, query):
+        match = ' '.join(f'"{stem(word)}"*' for word in WORD.findall(query))
+        if not match:
+            return queryset.none()
+        return queryset.filter(id__in=RawSQL(
+            f'SELECT rowid FROM {self.table} WHERE {self.table} MATCH %s',
+            (match,),
+        )).annotate(search_rank=RawSQL(
+            f'SELECT -bm25({self.table}, 10.0, 5.0, 1.0) FROM {self.table} '
+            f'WHERE {self.table} MATCH %s AND rowid = recipes_recipe.id',
+            (match,),
+        ))
+
+
+BACKENDS = {
+    'postgresql': PostgresSearch,
+    'sqlite': SqliteSearch,
+}
+
+
+def get_backend(db=connection):
+    backend = BACKENDS.get(db.vendor)
+    return backend() if backend else None
+
+
+def index_recipes(ids):
+    """Переиндексация рецептов с указанными id."""
+    backend = get_backend()
+    if backend and ids:
+        with connection.cursor() as cursor:
+            backend.index(cursor, ids)
+
+
+def rebuild_index():
+    """Полная переиндексация, например после массовой загрузки."""
+    backend = get_backend()
+    if backend:
+        with connection.cursor() as cursor:
+            backend.index(cursor)
+
+
+def remove_recipes(ids):
+    backend = get_backend()
+    if backend and ids:
+        with connection.cursor() as cursor:
+            backend.remove(cursor, ids)
+
+
+def search_recipes(queryset, query):
+    """Рецепты, подходящие под запрос, по убыванию релевантности."""
+    backend = get_backend()
+    if backend is None:
+        return queryset.filter(name__icontains=query)
+    return backend.search(queryset, query).order_by('-search_rank', '-id')
@@ -0,0 +1,102 @@
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import (Favorite, Ingredient, IngredientInRecipe, Recipe,
+                     ShoppingList)
+from .search import index_recipes, remove_recipes
+
+User = get_user_model()
+
+
+def change_counter(model, pk, field, delta, **fields):
+    """Атомарное изменение счетчика F-выражением, без ухода ниже нуля.
+
+    В fields передаются поля, обновляемые вместе со счетчиком.
+    """
+    queryset = model.objects.filter(pk=pk)
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    queryset.update(**{field: F(field) + delta}, **fields)
+
+
+def reindex_pending():
+    recipe_ids, connection.pending_reindex = connection.pending_reindex, set()
+    index_recipes(sorted(recipe_ids))
+
+
+def reindex_on_commit(recipe_ids):
+    """Переиндексация после коммита, одна на транзакцию: рецепт и строки
+    его ингредиентов сохраняются по одной, а индекс достаточно обновить
+    один раз. id копятся на соединении, пока запланированная функция не
+    выполнена; после отката она отбрасывается и планируется заново."""
+    scheduled = any(func is reindex_pending
+                    for sids, func in connection.run_on_commit)
+    if not scheduled:
+        connection.pending_reindex = set()
+    connection.pending_reindex.update(recipe_ids)
+    if not scheduled:
+        transaction.on_commit(reindex_pending)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_saved(sender, instance, **kwargs):
+    """Переиндексация после коммита, когда сохранены и ингредиенты."""
+    reindex_on_commit([instance.id])
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted(sender, instance, **kwargs):
+    remove_recipes([instance.id])
+
+
+@receiver([post_save, post_delete], sender=IngredientInRecipe)
+def recipe_ingredients_changed(sender, instance, **kwargs):
+    reindex_on_commit([instance.recipe_id])
+
+
+@receiver(post_save, sender=Ingredient)
+def ingredient_renamed(sender, instance, created, **kwargs):
+    if created:
+        return
+    transaction.on_commit(lambda: index_recipes(list(
+        IngredientInRecipe.objects.filter(ingredient=instance)
+        .values_list('recipe_id', flat=True).distinct())))
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_created(sender, instance, created, **kwargs):
+    if created:
+        change_counter(User, instance.author_id, 'recipes_count', 1)
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_removed(sender, instance, **kwargs):
+    change_counter(User, instance.author_id, 'recipes_count', -1)
+
+
+@receiver(post_save, sender=Favorite)
+def favorite_added(sender, instance, created, **kwargs):
+    if created:
+        change_counter(Recipe, instance.recipe_id, 'favorites_count', 1,
+                       updated_at=timezone.now())
+
+
+@receiver(post_delete, sender=Favorite)
+def favorite_removed(sender, instance, **kwargs):
+    change_counter(Recipe, instance.recipe_id, 'favorites_count', -1,
+                   updated_at=timezone.now())
+
+
+@receiver(post_save, sender=ShoppingList)
+def cart_added(sender, instance, created, **kwargs):
+    if created:
+        change_counter(Recipe, instance.recipe_id, 'in_carts_count', 1)
+
+
+@receiver(post_delete, sender=ShoppingList)
+def cart_removed(sender, instance, **kwargs):
+    change_counter(Recipe, instance.recipe_id, 'in_carts_count', -1)
@@ -0,0 +1,80 @@
+"""Версии данных рецептов для кэшей.
+
+По версиям справочников, поколениям ответов и наличию лент подписчиков
+кэши API (справочники в памяти процессов, кэш ответов, ленты) узнают
+об изменениях данных. Модуль не зависит от api: сбросы вызывают и
+сигналы API, и команды управления приложения recipes. Версии и ленты
+хранятся в кэше по умолчанию, поколения — в кэше ответов; в локальном
+кэше долгоживущие записи хранятся не дольше LOCAL_CACHE_TIMEOUT (см.
+app.caches).
+"""
+import uuid
+
+from django.core.cache import cache, caches
+
+from app.caches import lifetime
+from users.models import Subscribe
+
+INGREDIENTS = 'ingredients'
+TAGS = 'tags'
+
+RESPONSES = 'responses'
+ALL = 'generation:all'
+LISTS = 'generation:lists'
+
+
+def catalog_version(name):
+    """Текущая версия справочника (меняется при каждом изменении)."""
+    return cache.get_or_set(f'catalog_version:{name}', uuid.uuid4().hex,
+                            timeout=lifetime(None))
+
+
+def bump_catalog_version(name):
+    """Сбрасывает версию справочника после изменения данных."""
+    cache.set(f'catalog_version:{name}', uuid.uuid4().hex,
+              timeout=lifetime(None))
+
+
+def recipe_generation(recipe_id):
+    return f'generation:recipe:{recipe_id}'
+
+
+def generations(*keys):
+    """Текущие поколения ответов; отсутствующее (удаленное или
+    вытесненное) создается заново."""
+    responses = caches[RESPONSES]
+    found = responses.get_many(keys)
+    for key in keys:
+        if key not in found:
+            found[key] = responses.get_or_set(
+                key, uuid.uuid4().hex, timeout=lifetime(None, RESPONSES))
+    return [found[key] for key in keys]
+
+
+def invalidate_recipes(recipe_ids, lists=True):
+    """Новые поколения ответов рецептов и, если lists, всех списков."""
+    keys = [recipe_generation(recipe_id) for recipe_id in recipe_ids]
+    if lists:
+        keys.append(LISTS)
+    caches[RESPONSES].delete_many(keys)
+
+
+def invalidate_all():
+    caches[RESPONSES].delete(ALL)
+
+
+def feed_key(user_id):
+    return f'feed:{user_id}'
+
+
+def drop_timeline(user_id):
+    """Сбрасывает ленту после изменения подписок пользователя."""
+    cache.delete(feed_key(user_id))
+
+
+def drop_followers_timelines(author_ids):
+    """Сбрасывает ленты подписчиков авторов после пакетной вставки
+    рецептов, которая не вызывает сигналов."""
+    followers = (Subscribe.objects.filter(author_id__in=author_ids)
+                 .values_list('user_id', flat=True).distinct())
+    cache.delete_many([feed_key(user_id) for user_id in followers])
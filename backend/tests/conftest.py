@@ -0,0 +1,39 @@
+import pytest
+from django.conf import settings
+
+
+@pytest.fixture(scope='session')
+def django_db_modify_db_settings(tmp_path_factory):
+    """Тестовая база SQLite — файл, а не память, чтобы ее видели
+    дочерние процессы."""
+    database = settings.DATABASES['default']
+    if database['ENGINE'] == 'django.db.backends.sqlite3':
+        database['TEST'] = {
+            **database.get('TEST', {}),
+            'NAME': str(tmp_path_factory.mktemp('db') / 'test.sqlite3'),
+        }
+
+
+@pytest.fixture
+def shared_cache(settings, tmp_path):
+    """Кэши в файлах: общие для процессов, как Redis."""
+    settings.CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': str(tmp_path / 'default'),
+        },
+        'responses': {
+            'BACKEND': 'api.cache_backends.FileBasedCache',
+            'LOCATION': str(tmp_path / 'responses'),
+        },
+    }
+
+
+@pytest.fixture
+def local_cache(settings):
+    settings.CACHES = {
+        **settings.CACHES,
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        },
+    }
@@ -0,0 +1,36 @@
+import pytest
+from rest_framework.test import APIClient
+
+from recipes.models import Favorite, Recipe, ShoppingList
+from users.models import User
+
+pytestmark = pytest.mark.django_db(transaction=True)
+
+
+@pytest.fixture
+def recipes():
+    author = User.objects.create(username='author',
+                                 email='author@example.com')
+    return [Recipe.objects.create(author=author, name=f'суп {number}',
+                                  text='суп', cooking_time=10)
+            for number in range(3)]
+
+
+@pytest.mark.parametrize('model, url, counter', [
+    (Favorite, '/api/recipes/favorite/', 'favorites_count'),
+    (ShoppingList, '/api/recipes/shopping_cart/', 'in_carts_count'),
+])
+def test_batch_remove_refreshes_counters(recipes, model, url, counter):
+    user = User.objects.create(username='reader', email='reader@example.com')
+    client = APIClient()
+    client.force_authenticate(user)
+    ids = [recipe.id for recipe in recipes]
+    client.post(url, {'recipes': ids}, format='json')
+
+    response = client.delete(url, {'recipes': ids[:2]}, format='json')
+
+    assert [result['status'] for result in response.json()['results']] == [
+        'removed', 'removed']
+    assert not model.objects.filter(user=user, recipe_id__in=ids[:2]).exists()
+    assert dict(Recipe.objects.values_list('id', counter)) == {
+        ids[0]: 0, ids[1]: 0, ids[2]: 1}
@@ -0,0 +1,42 @@
+import asyncio
+
+import pytest
+from django.test import AsyncRequestFactory
+from rest_framework.authtoken.models import Token
+
+from api import async_views
+from recipes.models import Favorite, Recipe
+from users.models import User
+
+pytestmark = pytest.mark.django_db(transaction=True)
+
+
+@pytest.fixture
+def recipe():
+    author = User.objects.create(username='author',
+                                 email='author@example.com')
+    return Recipe.objects.create(author=author, name='суп', text='суп',
+                                 cooking_time=10)
+
+
+def post_favorite(recipe_id, **headers):
+    request = AsyncRequestFactory().post(
+        f'/api/recipes/{recipe_id}/favorite/', **headers)
+    return asyncio.run(async_views.favorite(request, recipe_id))
+
+
+def test_missing_token_is_rejected_like_drf(recipe):
+    response = post_favorite(recipe.id)
+
+    assert response.status_code == 401
+    assert response['WWW-Authenticate'] == 'Token'
+
+
+def test_token_is_checked_outside_event_loop(recipe):
+    user = User.objects.create(username='reader', email='reader@example.com')
+    token = Token.objects.create(user=user)
+
+    response = post_favorite(recipe.id, authorization=f'Token {token.key}')
+
+    assert response.status_code == 201
+    assert Favorite.objects.filter(user=user, recipe=recipe).exists()
@@ -0,0 +1,66 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+
+from api.authentication import CachedTokenAuthentication, token_cache
+from users.models import User
+from .utils import in_other_process
+
+pytestmark = pytest.mark.django_db(transaction=True)
+
+
+@pytest.fixture
+def token():
+    user = User.objects.create_user(
+        username='reader', email='reader@foodgram.ru', password='pw12345xx')
+    token_cache.clear()
+    yield Token.objects.create(user=user)
+    token_cache.clear()
+
+
+def delete_token(key):
+    Token.objects.filter(key=key).delete()
+
+
+def make_admin(user_id):
+    user = User.objects.get(pk=user_id)
+    user.role = User.Role.ADMIN
+    user.save()
+
+
+def test_token_deleted_in_other_process_is_rejected(shared_cache, token):
+    authentication = CachedTokenAuthentication()
+    user, _ = authentication.authenticate_credentials(token.key)
+    assert user.pk == token.user_id
+    assert token_cache.get(token.key) is not None
+
+    in_other_process(delete_token, token.key)
+
+    with pytest.raises(AuthenticationFailed):
+        authentication.authenticate_credentials(token.key)
+
+
+def test_role_change_in_other_process_is_seen(shared_cache, token):
+    authentication = CachedTokenAuthentication()
+    authentication.authenticate_credentials(token.key)
+
+    in_other_process(make_admin, token.user_id)
+
+    user, _ = authentication.authenticate_credentials(token.key)
+    assert user.is_admin
+
+
+@pytest.mark.parametrize('cache_fixture', ['shared_cache', 'local_cache'])
+def test_cached_token_skips_database(cache_fixture, request, token):
+    request.getfixturevalue(cache_fixture)
+    authentication = CachedTokenAuthentication()
+    authentication.authenticate_credentials(token.key)
+
+    with CaptureQueriesContext(connection) as queries:
+        user, _ = authentication.authenticate_credentials(token.key)
+
+    assert user.pk == token.user_id
+    assert not [query for query in queries.captured_queries
+                if 'authtoken_token' in query['sql']]
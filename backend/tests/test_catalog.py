@@ -0,0 +1,51 @@
+import pytest
+from rest_framework.test import APIClient
+
+from api.catalog import ingredient_index, tag_choices
+from recipes.models import Ingredient, Tag
+from .utils import in_other_process
+
+pytestmark = pytest.mark.django_db(transaction=True)
+
+
+def add_tag(slug):
+    Tag.objects.create(name=slug, slug=slug, color='#E26C2D')
+
+
+def rename_ingredient(ingredient_id, name):
+    ingredient = Ingredient.objects.get(pk=ingredient_id)
+    ingredient.name = name
+    ingredient.save()
+
+
+def test_tag_added_in_other_process_is_accepted(shared_cache):
+    assert tag_choices() == []
+
+    in_other_process(add_tag, 'breakfast')
+
+    assert tag_choices() == [('breakfast', 'breakfast')]
+    response = APIClient().get('/api/recipes/?tags=breakfast')
+    assert response.status_code == 200
+
+
+def test_ingredient_changed_in_other_process_is_found(shared_cache):
+    ingredient = Ingredient.objects.create(name='соль',
+                                           measurement_unit='г')
+    assert ingredient_index.search('со', 10)[0]['name'] == 'соль'
+
+    in_other_process(rename_ingredient, ingredient.id, 'сахар')
+
+    assert ingredient_index.search('са', 10)[0]['name'] == 'сахар'
+    assert ingredient_index.search('со', 10) == []
+
+
+def test_empty_ingredient_query_is_limited(settings):
+    settings.INGREDIENTS_SEARCH_LIMIT = 2
+    Ingredient.objects.bulk_create(
+        [Ingredient(name=name, measurement_unit='г')
+         for name in ('мука', 'соль', 'сахар')])
+    ingredient_index.load()
+
+    response = APIClient().get('/api/ingredients/?name=')
+
+    assert len(response.json()) == 2
@@ -0,0 +1,24 @@
+import pytest
+from rest_framework.test import APIClient
+
+from recipes.models import Tag
+from .utils import in_other_process
+
+pytestmark = pytest.mark.django_db(transaction=True)
+
+
+def add_tag(slug):
+    Tag.objects.create(name=slug, slug=slug, color='#E26C2D')
+
+
+def test_tags_etag_changes_after_change_in_other_process(shared_cache):
+    client = APIClient()
+    etag = client.get('/api/tags/')['ETag']
+    assert client.get('/api/tags/',
+                      HTTP_IF_NONE_MATCH=etag).status_code == 304
+
+    in_other_process(add_tag, 'breakfast')
+
+    response = client.get('/api/tags/', HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert response['ETag'] != etag
@@ -0,0 +1,24 @@
+from django.test import RequestFactory
+
+from api.db_router import PRIMARY, ReplicaRouter, client_key, primary, replica
+from recipes.models import Recipe
+
+
+def test_clients_behind_proxy_are_pinned_separately():
+    factory = RequestFactory()
+    first = factory.post('/api/recipes/', HTTP_X_REAL_IP='10.0.0.1')
+    second = factory.post('/api/recipes/', HTTP_X_REAL_IP='10.0.0.2')
+
+    assert first.META['REMOTE_ADDR'] == second.META['REMOTE_ADDR']
+    assert client_key(first) != client_key(second)
+
+
+def test_primary_overrides_replica_of_request():
+    router = ReplicaRouter()
+    token = replica.set('replica1')
+    try:
+        with primary():
+            assert router.db_for_read(Recipe) == PRIMARY
+        assert router.db_for_read(Recipe) == 'replica1'
+    finally:
+        replica.reset(token)
@@ -0,0 +1,42 @@
+import time
+
+import pytest
+from django.core.cache import cache
+
+from api.feed import get_timeline
+from recipes.models import Recipe
+from recipes.versions import feed_key
+from users.models import Subscribe, User
+from .utils import in_other_process
+
+pytestmark = pytest.mark.django_db(transaction=True)
+
+
+def create_user(username):
+    return User.objects.create(username=username,
+                               email=f'{username}@example.com')
+
+
+def subscribe(user_id, author_id):
+    Subscribe.objects.create(user_id=user_id, author_id=author_id)
+
+
+def test_subscription_in_other_process_updates_feed(shared_cache):
+    reader = create_user('reader')
+    author = create_user('author')
+    recipe = Recipe.objects.create(author=author, name='суп', text='суп',
+                                   cooking_time=10)
+    assert get_timeline(reader.id) == []
+
+    in_other_process(subscribe, reader.id, author.id)
+
+    assert get_timeline(reader.id) == [recipe.id]
+
+
+def test_local_feed_expires_soon(local_cache, settings):
+    reader = create_user('reader')
+
+    get_timeline(reader.id)
+
+    expires = cache._expire_info[cache.make_key(feed_key(reader.id))]
+    assert expires <= time.time() + settings.LOCAL_CACHE_TIMEOUT
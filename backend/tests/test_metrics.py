@@ -0,0 +1,57 @@
+import asyncio
+
+import pytest
+from django.test import AsyncClient, Client
+
+from api.metrics import RequestMetrics, current
+from api.serializers import TagSerializer
+from recipes.models import Tag
+from users.models import User
+
+
+@pytest.mark.django_db
+def test_serialization_of_api_serializers_is_timed():
+    tags = [Tag.objects.create(name=slug, slug=slug, color=color)
+            for slug, color in (('breakfast', '#E26C2D'),
+                                ('dinner', '#49B64E'))]
+    metrics = RequestMetrics()
+    token = current.set(metrics)
+    try:
+        TagSerializer(tags, many=True).data
+    finally:
+        current.reset(token)
+
+    assert metrics.timings['serialize'] > 0
+
+
+@pytest.mark.parametrize('meta, status', [
+    ({'REMOTE_ADDR': '172.18.0.5'}, 200),
+    ({'REMOTE_ADDR': '203.0.113.7'}, 403),
+    ({'REMOTE_ADDR': '172.18.0.5', 'HTTP_X_REAL_IP': '203.0.113.7'}, 403),
+])
+def test_metrics_are_served_inside_network_only(meta, status):
+    assert Client().get('/metrics', **meta).status_code == status
+
+
+@pytest.mark.parametrize('authorization, status', [
+    ('', 403),
+    ('Bearer wrong', 403),
+    ('Bearer secret', 200),
+])
+def test_metrics_token(settings, authorization, status):
+    settings.METRICS_TOKEN = 'secret'
+    response = Client().get('/metrics', REMOTE_ADDR='127.0.0.1',
+                            HTTP_AUTHORIZATION=authorization)
+
+    assert response.status_code == status
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.parametrize('url', ['/api/recipes/', '/api/users/1/'])
+def test_sql_is_counted_under_asgi(url):
+    User.objects.create(id=1, username='author', email='author@example.com')
+
+    response = asyncio.run(AsyncClient().get(url))
+
+    assert response.status_code == 200
+    assert '"0 SQL"' not in response['Server-Timing']
@@ -0,0 +1,19 @@
+import asyncio
+
+from django.core.handlers.asgi import ASGIHandler
+
+from api.middleware import (MetricsMiddleware, ProfilingMiddleware,
+                            ReplicaMiddleware)
+
+
+def test_middleware_chain_stays_async_under_asgi():
+    """Синхронное middleware в цепочке обернулось бы в sync_to_async."""
+    handler = ASGIHandler()._middleware_chain
+    chain = []
+    while asyncio.iscoroutinefunction(handler) and hasattr(
+            handler, '__wrapped__'):
+        chain.append(type(handler.__wrapped__))
+        handler = getattr(handler.__wrapped__, 'get_response', None)
+
+    assert {MetricsMiddleware, ProfilingMiddleware,
+            ReplicaMiddleware} <= set(chain)
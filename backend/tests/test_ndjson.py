@@ -0,0 +1,75 @@
+import json
+
+import pytest
+from rest_framework.test import APIClient
+
+from recipes.models import Ingredient, Recipe
+from recipes.ndjson import import_lines
+from users.models import User
+
+pytestmark = pytest.mark.django_db(transaction=True)
+
+
+def record(author, ingredient, **fields):
+    return json.dumps({
+        'author': author, 'name': 'суп', 'text': 'суп', 'cooking_time': 10,
+        'image': '', 'tags': [],
+        'ingredients': [{'name': ingredient, 'measurement_unit': 'г',
+                         'amount': 1}],
+        **fields,
+    }, ensure_ascii=False)
+
+
+def test_bad_lines_are_skipped_without_side_effects():
+    User.objects.create(username='author', email='author@example.com')
+    lines = [
+        record('author@example.com', 'соль'),
+        '{"author": ',
+        record('nobody@example.com', 'шафран'),
+    ]
+
+    results = list(import_lines(lines, batch_size=10))
+
+    assert [count for count, _ in results] == [1]
+    assert [number for number, _ in results[0][1]] == [2, 3]
+    assert Recipe.objects.count() == 1
+    assert not Ingredient.objects.filter(name='шафран').exists()
+
+
+@pytest.mark.parametrize('fields', [
+    {'author': ['author@example.com']},
+    {'cooking_time': '10'},
+    {'cooking_time': 0},
+    {'name': 'суп' * 100},
+    {'name': None},
+    {'tags': 'breakfast'},
+    {'ingredients': {'name': 'соль'}},
+    {'ingredients': [{'name': 'соль', 'amount': 1}]},
+    {'ingredients': [{'name': 'соль', 'measurement_unit': 'г',
+                      'amount': 1.5}]},
+    {'ingredients': [{'name': 'соль', 'measurement_unit': 'г',
+                      'amount': 0}]},
+])
+def test_invalid_record_is_reported_and_skipped(fields):
+    User.objects.create(username='author', email='author@example.com')
+    author = fields.pop('author', 'author@example.com')
+    lines = [record(author, 'соль', **fields),
+             record('author@example.com', 'перец')]
+
+    results = list(import_lines(lines, batch_size=10))
+
+    assert results[0][0] == 1
+    assert [number for number, _ in results[0][1]] == [1]
+    assert Recipe.objects.count() == 1
+
+
+@pytest.mark.parametrize('fields, status', [
+    ({'is_staff': True}, 403),
+    ({'role': User.Role.ADMIN}, 200),
+])
+def test_export_requires_admin_role(fields, status):
+    client = APIClient()
+    client.force_authenticate(User.objects.create(
+        username='user', email='user@example.com', **fields))
+
+    assert client.get('/api/recipes/export/').status_code == status
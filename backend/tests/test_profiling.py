@@ -0,0 +1,63 @@
+import pytest
+from django.db import connection
+from django.test import Client, RequestFactory
+from django.test.utils import CaptureQueriesContext
+
+from api.models import RequestProfile
+from api.profiling import profile_path, requested_by, trim_profiles
+from users.models import User
+
+pytestmark = pytest.mark.django_db
+
+
+def test_stale_profiles_are_trimmed_with_one_delete(settings, tmp_path):
+    settings.PROFILE_DIR = str(tmp_path)
+    settings.PROFILE_KEEP = 2
+    for number in range(5):
+        profile = RequestProfile.objects.create(
+            method='GET', path='/api/recipes/', view='recipes-list',
+            status=200, duration=0.1, file=f'{number}.prof')
+        profile_path(profile).write_bytes(b'')
+
+    with CaptureQueriesContext(connection) as queries:
+        trim_profiles()
+
+    deletes = [query for query in queries
+               if query['sql'].startswith('DELETE')]
+    assert len(deletes) == 1
+    assert RequestProfile.objects.count() == 2
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        '3.prof', '4.prof']
+
+
+@pytest.mark.parametrize('fields, profiled', [
+    ({'is_staff': True}, False),
+    ({'role': User.Role.ADMIN}, True),
+])
+def test_profile_is_requested_by_admin_role(fields, profiled):
+    request = RequestFactory().get('/api/recipes/', HTTP_X_PROFILE='1')
+    request.user = User.objects.create(username='user',
+                                       email='user@example.com', **fields)
+
+    assert (requested_by(request) is not None) == profiled
+
+
+@pytest.mark.parametrize('fields, header', [
+    (None, False),
+    ({'is_staff': True}, False),
+    ({'role': User.Role.ADMIN}, True),
+])
+def test_profile_id_is_shown_to_admin_only(settings, tmp_path, fields,
+                                           header):
+    settings.PROFILE_DIR = str(tmp_path)
+    settings.PROFILE_SAMPLE_RATE = 1
+    settings.PROFILE_ROUTES = ['tags-list']
+    client = Client()
+    if fields is not None:
+        client.force_login(User.objects.create(
+            username='user', email='user@example.com', **fields))
+
+    response = client.get('/api/tags/', HTTP_X_PROFILE='1')
+
+    assert RequestProfile.objects.count() == 1
+    assert response.has_header('X-Profile-Id') == header
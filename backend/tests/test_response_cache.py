@@ -0,0 +1,78 @@
+import pytest
+from rest_framework.test import APIClient
+
+from api.response_cache import stats
+from recipes.models import Recipe
+from users.models import User
+from .utils import in_other_process
+
+pytestmark = pytest.mark.django_db(transaction=True)
+
+
+@pytest.fixture
+def recipe():
+    author = User.objects.create_user(
+        username='author', email='author@foodgram.ru', password='pw12345xx')
+    return Recipe.objects.create(
+        author=author, name='Суп', text='Сварить', cooking_time=10,
+        image='images/soup.jpg')
+
+
+def rename(recipe_id, name):
+    recipe = Recipe.objects.get(pk=recipe_id)
+    recipe.name = name
+    recipe.save()
+
+
+def test_anonymous_response_is_cached(shared_cache, recipe):
+    client = APIClient()
+    first = client.get(f'/api/recipes/{recipe.id}/')
+    Recipe.objects.filter(pk=recipe.id).update(name='Без сигналов')
+    second = client.get(f'/api/recipes/{recipe.id}/')
+
+    assert second.status_code == 200
+    assert second.content == first.content
+    assert stats()['hits'] == 1
+
+
+def test_cached_response_keeps_headers(shared_cache, recipe):
+    client = APIClient()
+    first = client.get(f'/api/recipes/{recipe.id}/')
+    second = client.get(f'/api/recipes/{recipe.id}/')
+
+    assert stats()['hits'] == 1
+    for header in ('Content-Type', 'Vary', 'Allow'):
+        assert second[header] == first[header]
+
+
+def test_response_is_cached_per_host(shared_cache, recipe):
+    client = APIClient()
+    client.get(f'/api/recipes/{recipe.id}/', HTTP_HOST='evil.example')
+    response = client.get(f'/api/recipes/{recipe.id}/',
+                          HTTP_HOST='foodgram.example')
+
+    assert stats()['hits'] == 0
+    assert 'foodgram.example' in response.json()['image']
+
+
+def test_change_in_other_process_invalidates(shared_cache, recipe):
+    client = APIClient()
+    client.get(f'/api/recipes/{recipe.id}/')
+    client.get('/api/recipes/')
+
+    in_other_process(rename, recipe.id, 'Борщ')
+
+    assert client.get(f'/api/recipes/{recipe.id}/').json()['name'] == 'Борщ'
+    assert client.get('/api/recipes/').json()['results'][0]['name'] == 'Борщ'
+
+
+@pytest.mark.parametrize('fields, status', [
+    ({'is_staff': True}, 403),
+    ({'role': User.Role.ADMIN}, 200),
+])
+def test_stats_require_admin_role(fields, status):
+    client = APIClient()
+    client.force_authenticate(User.objects.create(
+        username='user', email='user@example.com', **fields))
+
+    assert client.get('/api/response-cache/').status_code == status
@@ -0,0 +1,35 @@
+import pytest
+from django.db import transaction
+from rest_framework.test import APIClient
+
+from recipes import signals
+from recipes.models import Ingredient, IngredientInRecipe, Recipe
+from users.models import User
+
+pytestmark = pytest.mark.django_db(transaction=True)
+
+
+def test_recipe_is_reindexed_once_per_transaction(monkeypatch):
+    calls = []
+    monkeypatch.setattr(signals, 'index_recipes', calls.append)
+    author = User.objects.create(username='author',
+                                 email='author@example.com')
+    ingredients = [Ingredient.objects.create(name=name, measurement_unit='г')
+                   for name in ('соль', 'сахар', 'мука')]
+
+    with transaction.atomic():
+        recipe = Recipe.objects.create(author=author, name='пирог',
+                                       text='пирог', cooking_time=30)
+        for ingredient in ingredients:
+            IngredientInRecipe.objects.create(recipe=recipe,
+                                              ingredient=ingredient,
+                                              amount=1)
+
+    assert calls == [[recipe.id]]
+
+
+def test_cursor_pagination_with_search_is_rejected():
+    response = APIClient().get('/api/recipes/?search=суп&cursor=')
+
+    assert response.status_code == 400
+    assert 'cursor' in response.json()
@@ -0,0 +1,19 @@
+import multiprocessing
+
+from django.db import connections
+
+
+def in_other_process(target, *args):
+    """Выполняет target в дочернем процессе, как в другом рабочем
+    процессе gunicorn: память процесса не общая, база и кэши общие."""
+    connections.close_all()
+    process = multiprocessing.get_context('fork').Process(
+        target=run, args=(target, *args))
+    process.start()
+    process.join()
+    assert process.exitcode == 0
+
+
+def run(target, *args):
+    target(*args)
+    connections.close_all()
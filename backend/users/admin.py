@@ -8,6 +8,7 @@ class UserAdmin(admin.ModelAdmin):
     list_display = (
         'pk', 'username', 'email', 'role',
         'is_superuser', 'first_name', 'last_name',
+        'recipes_count', 'followers_count',
     )
     list_editable = ('role',)
     search_fields = ('username', 'role',)
@@ -23,6 +23,16 @@ class User(AbstractUser):
         default=Role.USER,
         verbose_name="Права доступа",
     )
+    recipes_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name="Рецептов",
+    )
+    followers_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name="Подписчиков",
+    )
 
     class Meta:
         ordering = ["id"]